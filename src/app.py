@@ -1,4 +1,5 @@
 import re
+import uuid
 import streamlit as st
 from groq import Groq
 import time
@@ -14,8 +15,15 @@ from langchain.chains.conversation.memory import ConversationBufferWindowMemory,
 from langchain_groq import ChatGroq
 
 import input_facts
-from swi_interface import query
-from argumentation.arg_interface import get_full_theory, run_reasoner
+from cache import LRUCache, digest
+from result_store import get_store
+from swi_interface import query, evaluate, discover, applicable
+from argumentation.arg_interface import REASONER, get_full_theory, run_reasoner, conformity
+
+# summaries of the rights and of the arguments, shared by all sessions
+_summaries = LRUCache(1024)
+# reasoner outputs, shared by all sessions
+_arguments = LRUCache(1024)
 
 
 def prompt_model(prompt, system="", model="llama3-70b-8192", temperature=0.0):
@@ -48,20 +56,53 @@ def prompt_model(prompt, system="", model="llama3-70b-8192", temperature=0.0):
       time.sleep(3)
 
 
+def remember(cache, kind, key, compute):
+  """Value of key in cache, else in the result store under kind, else computed and kept in both.
+  Empty values, which the reasoner and the model give on failure, are not kept"""
+  store = get_store()
+  value = cache.get(key)
+  if value is None and store is not None:
+    value = store.get(kind, key)
+  if value is None:
+    value = compute()
+    if value and store is not None:
+      store.put(kind, key, value)
+  if value:
+    cache.put(key, value)
+  return value
+
+
 def facts_hash(context):
-  return hash(f"{context["facts"]}")
+  return digest(sorted(context["facts"]))
+
+
+def explained_hash(context):
+  return digest(context["right_target"], sorted(context["facts"]))
 
 
 def target_hash(context):
-  return hash(f"{context["right_target"]} - {context["country_target"]} - {context["opt_target"]} - {context["facts"]}")
+  return digest(context["right_target"], context["country_target"], context["opt_target"], sorted(context["facts"]))
+
+
+def conformity_hash(context):
+  return digest(context["directive_target"], sorted(context["facts"]))
 
 
 def pretty_rights(context):
+   if context["all_directives"]:
+      if facts_hash(context) not in context["discovered"]:
+         return ""
+      # the directive goes last, select_state reads the right and option from the second and third fields
+      return [i["article"] + " - " + i["right"] + " - " + i["option"] + " - " + d for d, rights in context["discovered"][facts_hash(context)].items() for _, v in rights.items() for i in v["directive"]]
    if facts_hash(context) not in context["rights"]:
       return ""
    return [i["article"] + " - " + i["right"] + " - " + i["option"] for _, v in context["rights"][facts_hash(context)].items() for i in v["directive"]]
 
 
+def pretty_not_applicable(context):
+   return [d for d, applies in context["applies"].get(facts_hash(context), {}).items() if not applies]
+
+
 def filter_target(rights, context):
    if context["right_target"] not in rights:
       return {}
@@ -106,6 +147,8 @@ def select_prompt(context):
 
       {"\n".join(pretty_rights(context))}
 
+      Directives that do not apply to the case: {", ".join(pretty_not_applicable(context)) or "none"}.
+
       Format of the answer:
       - Tell the user the list of computed rights in natural language.
       - Ensure that each main right is matched to its corresponding options and article. The same right can have more than one option and article.
@@ -115,6 +158,7 @@ def select_prompt(context):
       DO NOT invent any rights, only present what has been computed.
       Present all rights.
 
+      If a directive does not apply to the case, tell the user so before listing any right.
       If no rights apply, ask the user if more details should be provided to the scenario.
       If rights are granted, ask if the user wants to know more details any of these rights.
 
@@ -124,7 +168,7 @@ def select_prompt(context):
 
       These are the details on {context["right_target"]} - {context["opt_target"]}:
 
-      {natural_language(filter_target(context["rights"][facts_hash(context)], context))}
+      {natural_language(filter_target(context["explained"].get(explained_hash(context), {}), context))}
 
       Respect this instruction:
       DO NOT invent any rights, only present what has been computed.
@@ -178,10 +222,16 @@ def select_state(messages, context):
 
 def run_argumentation(context):
     if context["right_target"] and context["country_target"] and target_hash(context) not in context["arguments"]:
-      rules = [x["arg_rule"] for x in filter_target(context["rights"][facts_hash(context)], context)] + [x["arg_rule"] for x in filter_target(context["target"][target_hash(context)], context)]
-      theory = get_full_theory("\n".join(rules), [context["country_target"]])
-      context["arguments"][target_hash(context)] = run_reasoner(theory)
-      context["pretty_arguments"][target_hash(context)] = prompt_model(f"""
+      european = list(filter_target(context["explained"].get(explained_hash(context), {}), context))
+      national = list(filter_target(context["target"][target_hash(context)], context))
+      rules = sorted(set(x["arg_rule"] for x in european + national))
+      laws = [context["country_target"]]
+      # rule ids come from their content, so the same rules and countries make the same arguments in any session
+      key = digest(REASONER, rules, sorted(laws))
+      theory = get_full_theory("\n".join(rules), laws)
+      context["arguments"][target_hash(context)] = remember(_arguments, "arguments", key, lambda: run_reasoner(theory))
+      details = [{name: value for name, value in x.items() if name != "pretty_explanation"} for x in national + european]
+      context["pretty_arguments"][target_hash(context)] = remember(_summaries, "pretty_arguments", digest(key, details), lambda: prompt_model(f"""
         Arguments on conformity with national implementations [{context["country_target"]}]:
 
         {context["arguments"][target_hash(context)]}
@@ -207,10 +257,10 @@ def run_argumentation(context):
 
         Details on european implementation:
 
-        {filter_target(context["rights"][facts_hash(context)], context)}
+        {filter_target(context["explained"].get(explained_hash(context), {}), context)}
 
         Explain if there is conformity and why.
-      """)
+      """))
       print("Argumentation result:")
       print(context["arguments"][target_hash(context)])
       print()
@@ -219,6 +269,26 @@ def run_argumentation(context):
       print()
 
 
+def run_conformity(context):
+    # every right of the case against every country of the directive, in one query and one evaluation
+    if conformity_hash(context) in context["conformity"]:
+      return
+    try:
+      laws = list(input_facts.national_facts[context["directive_target"]])
+      rights = query(context["person_id"], context["facts"], ["dir"] + laws, [context["directive_target"]], session=context["session_id"])
+      rules = sorted(set(x["arg_rule"] for _, v in rights.items() for _, r in v.items() for x in r))
+      context["conformity"][conformity_hash(context)] = conformity("\n".join(rules), laws)
+      print("Conformity overview:")
+      print(context["conformity"][conformity_hash(context)])
+      print()
+    except Exception as e:
+      print(e)
+
+
+def pretty_conformity(context):
+    return "".join(f"\n\n- {right} ({option}, {article}) in **{country}**: {level}" for (right, option, article, country), level in sorted(context["conformity"].get(conformity_hash(context), {}).items()))
+
+
 def extract_facts(user_text, context):
   def _extract_code(completion):
     from mdextractor import extract_md_blocks
@@ -292,17 +362,28 @@ def prettify_prolog(input):
       Use enumerations in the 'What Rights do You Have' and 'Why do You Have Them' sections if needed.
     """)
 
+  # the same right, explanation and article always get the same summary, so the rights a new fact
+  # leaves untouched keep theirs
   for _, v in input.items():
     for _, r in v.items():
        for x in r:
-          x["pretty_explanation"] = _prettify(x)
+          key = digest({name: value for name, value in x.items() if name not in ("pretty_explanation", "arg_rule")})
+          x["pretty_explanation"] = remember(_summaries, "pretty", key, lambda: _prettify(x))
 
 def run_dir_prolog(context):
+  if context["all_directives"]:
+     return discover_dir_prolog(context)
+  # only the list of rights is needed until the user asks about one of them
   if facts_hash(context) in context["rights"]:
      return
   try:
-    context["rights"][facts_hash(context)] = query(context["person_id"], context["facts"], ["dir"], [context["directive_target"]])
-    prettify_prolog(context["rights"][facts_hash(context)])
+    context["applies"][facts_hash(context)] = applicable(context["person_id"], context["facts"], [context["directive_target"]])
+    if not context["applies"][facts_hash(context)].get(context["directive_target"], True):
+       # no right of a directive that does not apply can hold
+       context["rights"][facts_hash(context)] = {}
+       print("Dir does not apply: " + context["directive_target"])
+       return
+    context["rights"][facts_hash(context)] = query(context["person_id"], context["facts"], ["dir"], [context["directive_target"]], session=context["session_id"], explanation=False)
     print("Dir rights:")
     print(context["rights"][facts_hash(context)])
     print()
@@ -310,11 +391,47 @@ def run_dir_prolog(context):
     print(e)
 
 
+def discover_dir_prolog(context):
+  # all the directives are evaluated together, each one on its own engine
+  if facts_hash(context) in context["discovered"]:
+     return
+  try:
+    context["applies"][facts_hash(context)] = applicable(context["person_id"], context["facts"])
+    selected = [d for d, applies in context["applies"][facts_hash(context)].items() if applies]
+    context["discovered"][facts_hash(context)] = {d: r["rights"] for d, r in discover(context["person_id"], context["facts"], modules=selected, session=context["session_id"]).items()}
+    print("Dir rights (all directives):")
+    print(context["discovered"][facts_hash(context)])
+    print()
+  except Exception as e:
+    print(e)
+
+
+def select_directive(context):
+  # the right asked about decides the directive, when all of them were searched
+  if not context["all_directives"]:
+     return
+  discovered = context["discovered"].get(facts_hash(context), {})
+  context["directive_target"] = next((d for d, rights in discovered.items() if context["right_target"] in rights), context["directive_target"])
+
+
+def explain_dir_prolog(context):
+  if explained_hash(context) in context["explained"]:
+     return
+  try:
+    context["explained"][explained_hash(context)] = query(context["person_id"], context["facts"], ["dir"], [context["directive_target"]], right=context["right_target"], session=context["session_id"])
+    prettify_prolog(context["explained"][explained_hash(context)])
+    print("Dir explanation:")
+    print(context["explained"][explained_hash(context)])
+    print()
+  except Exception as e:
+    print(e)
+
+
 def run_national_prolog(context):
   if target_hash(context) in context["target"]:
      return
   try:
-    context["target"][target_hash(context)] = query(context["person_id"], context["facts"], [context["country_target"]], [context["directive_target"]], right=context["right_target"])
+    context["target"][target_hash(context)] = query(context["person_id"], context["facts"], [context["country_target"]], [context["directive_target"]], right=context["right_target"], session=context["session_id"])
     prettify_prolog(context["target"][target_hash(context)])
     print("National result:")
     print(context["target"][target_hash(context)])
@@ -324,10 +441,14 @@ def run_national_prolog(context):
 
 def suggest_facts(context):
   try:
-      response = query(context["person_id"], context["facts"], [context["country_target"]], [context["directive_target"]], right=context["right_target"], abduce=True)
-      context["suggestions"] = set([y for _, v in response[context["right_target"]].items() for x in v for y in x["abduced"]])
+      result = evaluate(context["person_id"], context["facts"], [context["country_target"]], [context["directive_target"]], right=context["right_target"], abduce=True, session=context["session_id"])
+      response = result["rights"]
+      context["suggestions"] = set([y for _, v in response.get(context["right_target"], {}).items() for x in v for y in x["abduced"]])
       print("Abduction result:")
       print(context["suggestions"])
+      if result["incomplete"]:
+        print("Abduction cut short by the query limits in:")
+        print(result["incomplete"])
       print()
   except Exception as e:
     print(e)
@@ -352,16 +473,22 @@ def main():
     if "chat_message" not in st.session_state:
       st.session_state.context = {
         "state" : "1",
+        "session_id" : uuid.uuid4().hex,
         "person_id" : "",
         "directive_target" : "",
+        "all_directives" : False,
         "facts" : [],
         "rights" : {},
+        "discovered" : {},
+        "applies" : {},
+        "explained" : {},
         "country_target" : "",
         "right_target" : "",
         "opt_target" : "",
         "target" : {},
         "arguments" : {},
         "pretty_arguments" : {},
+        "conformity" : {},
         "suggestions" : set()
       }
       st.session_state.chat_message = []
@@ -375,6 +502,12 @@ def main():
     dirs = ["directive_2010_64", "directive_2012_13", "directive_2016_343", "directive_2013_48"]
     selected_dir = st.sidebar.selectbox('Choose from the list the relevant directives: Directive 2010/64 on right to interpretation and translation; 2012/13 on the right to information, 2016/343 on the presumption of innocence; 2013/48 on the right of access to a lawyer', dirs)
 
+    all_dirs = st.sidebar.checkbox('Search the rights in all the directives at once')
+
+    # the overview is computed by the native engine, so it is only offered when the conformity in the chat
+    # comes from the same engine
+    overview = REASONER == "native" and st.sidebar.checkbox('Show the conformity of every right with every national law')
+
     laws = ["it", "nl", "bg", "pl"]
     selected_law = st.sidebar.selectbox('Choose the country where the proceedings are taking place, therefore the applicable national law:', laws)
 
@@ -413,6 +546,7 @@ def main():
 
     st.session_state.context["country_target"] = selected_law
     st.session_state.context["directive_target"] = selected_dir
+    st.session_state.context["all_directives"] = all_dirs
 
     if user_question := st.chat_input("Describe your case:"):
 
@@ -433,7 +567,16 @@ def main():
           {"".join(["\n\n- **" + x + "**" for x in st.session_state.context["facts"]])}
         """)
 
+        if overview and st.session_state.context["facts"]:
+          run_conformity(st.session_state.context)
+          st.sidebar.markdown(f"""
+          ## Conformity:
+          {pretty_conformity(st.session_state.context)}
+          """)
+
         if st.session_state.context["state"] == "3":
+          select_directive(st.session_state.context)
+          explain_dir_prolog(st.session_state.context)
           run_national_prolog(st.session_state.context)
           run_argumentation(st.session_state.context)
           suggest_facts(st.session_state.context)
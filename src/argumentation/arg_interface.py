@@ -1,6 +1,15 @@
 import os
 import subprocess
 
+from argumentation import grounded
+
+reasoner = os.path.join(os.path.abspath(os.path.dirname(__file__)), "arg2p_grounded_no_pref_repl.jar")
+
+# "arg2p" runs the reasoner jar, "native" evaluates theories in-process with argumentation.grounded, whose
+# report lists the same labelled arguments in its own format
+REASONER = os.environ.get("CROSSJUSTICE_REASONER", "arg2p")
+REASONER_TIMEOUT = float(os.environ.get("CROSSJUSTICE_REASONER_TIMEOUT", 60))
+
 def get_full_theory(theory, laws):
     return fr"""
         r1 : right(directive, Art, Right, Option, Facts), prolog(member(Y, {laws})), right(Y, Art1, Right, Option, Facts) -> conformity(Y, Art).
@@ -9,23 +18,78 @@ def get_full_theory(theory, laws):
         conflict([conformity(Y, Art)], [partialConformity(Y, Art)]).
     """ + "\n\n" + theory
 
-def run_reasoner(theory):
-    reasoner = os.path.join(os.path.abspath(os.path.dirname(__file__)), "arg2p_grounded_no_pref_repl.jar")
+def get_conformity_theory(theory, laws):
+    """As get_full_theory, with the right and option in the conclusions, so that the rules of several rights
+    can be evaluated together without their conclusions on the same article attacking each other"""
+    return fr"""
+        r1 : right(directive, Art, Right, Option, Facts), prolog(member(Y, {laws})), right(Y, Art1, Right, Option, Facts) -> conformity(Y, Art, Right, Option).
+        r2 : right(directive, Art, Right, Option, Facts), prolog(member(Y, {laws})), right(Y, Art1, Right, Option, Facts1), prolog(Facts \= Facts1) => partialConformity(Y, Art, Right, Option).
+        r3 : right(directive, Art, Right, Option, Facts), prolog(member(Y, {laws})), ~(right(Y, Art1, Right, Option, Facts)) -> -conformity(Y, Art, Right, Option).
+        conflict([conformity(Y, Art, Right, Option)], [partialConformity(Y, Art, Right, Option)]).
+    """ + "\n\n" + theory
+
+
+_levels = {"conformity": "full", "partialConformity": "partial", "-conformity": "none"}
+
+def conformity(theory, laws):
+    """Conformity of every directive right in theory with every country in laws, from a single evaluation, as
+    {(right, option, article, country): "full" | "partial" | "none"}, or {} if theory cannot be parsed.
+    It runs on the native engine whatever REASONER is, as the labels of the arguments are needed, so it only
+    agrees with run_reasoner when REASONER is native"""
+    try:
+        labelled = grounded.solve(get_conformity_theory(theory, laws))
+    except ValueError as e:
+        print(e)
+        return {}
+    result = {}
+    rank = ["none", "partial", "full"]
+    for label, arguments in labelled.items():
+        for argument in arguments:
+            negated = isinstance(argument.conclusion, tuple) and argument.conclusion[0] == "-"
+            literal = argument.conclusion[1] if negated else argument.conclusion
+            if not isinstance(literal, tuple) or len(literal) != 5:
+                continue
+            name = ("-" if negated else "") + literal[0]
+            if name not in _levels:
+                continue
+            country, article, right, option = literal[1:]
+            key = tuple(grounded.render(x) for x in (right, option, article, country))
+            level = _levels[name] if label == "IN" else "none"
+            if rank.index(level) >= rank.index(result.get(key, "none")):
+                result[key] = level
+    return result
+
+
+def _run_once(theory):
     try:
         return subprocess.run(
             ["java", "-jar", reasoner, theory],
             capture_output=True,
             text=True,
-            check=True
+            check=True,
+            timeout=REASONER_TIMEOUT
         ).stdout
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
         print(e)
         return ""
 
+def _run_native(theory):
+    try:
+        return grounded.run(theory)
+    except ValueError as e:
+        print(e)
+        return ""
+
+def run_reasoner(theory):
+    if REASONER == "native":
+        return _run_native(theory)
+    return _run_once(theory)
+
 if __name__ == "__main__":
-    theory = get_full_theory("""
+    rules = """
         f1 :-> right(directive, art2_7, right_to_interpretation, europeanArrestWarrant, [proceeding_language(nino, polish), proceeding_type(nino, europeanArrestWarrant)]).
         f3 :=> right(pl, article607l_4, right_to_interpretation, europeanArrestWarrant, [proceeding_language(nino, polish), proceeding_type(nino, europeanArrestWarrant)]).
-    """, ["pl"])
+    """
 
-    print(run_reasoner(theory))
+    print(run_reasoner(get_full_theory(rules, ["pl"])))
+    print(conformity(rules, ["pl", "it"]))
@@ -0,0 +1,373 @@
+"""Grounded semantics for the structured argumentation theories built by arg_interface.get_full_theory.
+
+The fragment covered is the one the conformity theory uses:
+  - strict rules "label : body -> head." and defeasible rules "label : body => head.",
+  - strict facts "label :-> head." and defeasible facts "label :=> head.",
+  - prolog(Goal) guards in rule bodies, Goal being member/2, =/2, \\=/2, ==/2 or \\==/2,
+  - negation as failure ~(Literal) in rule bodies, Literal possibly having free variables,
+  - strong negation -Literal and conflict([A], [B]) declarations,
+over ground facts and without preferences.
+"""
+
+import re
+import itertools
+
+
+class Var:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+# terms are atoms and numbers, Var, lists and compounds as tuples (name, arg1, ..., argN)
+
+_token = re.compile(
+    r"\s*(?:(?P<number>\d+(?:\.\d+)?)"
+    r"|(?P<var>[A-Z_]\w*)"
+    r"|(?P<atom>[a-z]\w*|'(?:[^'\\]|\\.)*')"
+    r"|(?P<symbol>:->|:=>|->|=>|\\==|\\=|==|[-~:=,()\[\]|.]))"
+)
+
+
+def _tokenize(text):
+    tokens, position = [], 0
+    text = re.sub(r"%.*", "", text)
+    while position < len(text):
+        match = _token.match(text, position)
+        if match is None:
+            if text[position:].strip():
+                raise ValueError("unexpected input: %s" % text[position:position + 20])
+            break
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "atom" and value.startswith("'"):
+            value = value[1:-1]
+        tokens.append((kind, value))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, tokens):
+        self._tokens = tokens
+        self._position = 0
+        self._vars = {}
+
+    def peek(self):
+        return self._tokens[self._position] if self._position < len(self._tokens) else (None, None)
+
+    def take(self, value=None):
+        token = self.peek()
+        if token[0] is None or (value is not None and token[1] != value):
+            raise ValueError("expected %s, found %s" % (value, token[1]))
+        self._position += 1
+        return token
+
+    def done(self):
+        return self._position >= len(self._tokens)
+
+    def clause(self):
+        """label : body -> head, label : body => head, label :-> head, label :=> head or a bare term"""
+        self._vars = {}
+        first = self.term()
+        kind, value = self.peek()
+        if value in (":->", ":=>"):
+            self.take()
+            clause = (first, [], self.term(), value == ":=>")
+        elif value == ":":
+            self.take()
+            body = [self.term()]
+            while self.peek()[1] == ",":
+                self.take()
+                body.append(self.term())
+            arrow = self.take()[1]
+            if arrow not in ("->", "=>"):
+                raise ValueError("expected -> or =>, found %s" % arrow)
+            clause = (first, body, self.term(), arrow == "=>")
+        else:
+            clause = first
+        self.take(".")
+        return clause
+
+    def term(self):
+        kind, value = self.peek()
+        if value in ("-", "~") and kind == "symbol":
+            self.take()
+            return (value, self.term())
+        left = self.primary()
+        if self.peek()[1] in ("=", "\\=", "==", "\\=="):
+            operator = self.take()[1]
+            return (operator, left, self.primary())
+        return left
+
+    def primary(self):
+        kind, value = self.take()
+        if kind == "number":
+            return float(value) if "." in value else int(value)
+        if kind == "var":
+            if value == "_":
+                return Var("_")
+            return self._vars.setdefault(value, Var(value))
+        if value == "[":
+            items = []
+            if self.peek()[1] != "]":
+                items.append(self.term())
+                while self.peek()[1] == ",":
+                    self.take()
+                    items.append(self.term())
+            self.take("]")
+            return items
+        if value == "(":
+            inner = self.term()
+            self.take(")")
+            return inner
+        if kind == "atom" or value in ("-", "~"):
+            if self.peek()[1] == "(":
+                self.take()
+                args = [self.term()]
+                while self.peek()[1] == ",":
+                    self.take()
+                    args.append(self.term())
+                self.take(")")
+                return (value, *args)
+            return value
+        raise ValueError("unexpected %s" % value)
+
+
+def _walk(term, bindings):
+    while isinstance(term, Var) and term in bindings:
+        term = bindings[term]
+    return term
+
+
+def _unify(a, b, bindings):
+    """Extends bindings so that a and b are equal, or returns None"""
+    a, b = _walk(a, bindings), _walk(b, bindings)
+    if a is b:
+        return bindings
+    if isinstance(a, Var):
+        return {**bindings, a: b}
+    if isinstance(b, Var):
+        return {**bindings, b: a}
+    if isinstance(a, list) and isinstance(b, list) or isinstance(a, tuple) and isinstance(b, tuple):
+        if len(a) != len(b):
+            return None
+        for x, y in zip(a, b):
+            bindings = _unify(x, y, bindings)
+            if bindings is None:
+                return None
+        return bindings
+    return bindings if a == b and type(a) is type(b) else None
+
+
+def _resolve(term, bindings):
+    term = _walk(term, bindings)
+    if isinstance(term, list):
+        return [_resolve(x, bindings) for x in term]
+    if isinstance(term, tuple):
+        return tuple(_resolve(x, bindings) for x in term)
+    return term
+
+
+def _ground(term):
+    if isinstance(term, Var):
+        return False
+    if isinstance(term, (list, tuple)):
+        return all(_ground(x) for x in term)
+    return True
+
+
+def _freeze(term):
+    """Hashable form of a ground term"""
+    if isinstance(term, list):
+        return ("[]", *(_freeze(x) for x in term))
+    if isinstance(term, tuple):
+        return tuple(_freeze(x) for x in term)
+    return term
+
+
+def render(term):
+    """Prolog text of a term, strong negation being written '-'(Literal)"""
+    if isinstance(term, Var):
+        return "_"
+    if isinstance(term, list):
+        return "[" + ", ".join(render(x) for x in term) + "]"
+    if isinstance(term, tuple):
+        name = "'-'" if term[0] == "-" else term[0]
+        return f"{name}({', '.join(render(x) for x in term[1:])})"
+    return str(term)
+
+
+def _guard(goal, bindings):
+    """Bindings under which a prolog(Goal) guard holds"""
+    name = goal[0] if isinstance(goal, tuple) else goal
+    if name == "true":
+        yield bindings
+    elif name == "member":
+        for item in _walk(goal[2], bindings):
+            extended = _unify(goal[1], item, bindings)
+            if extended is not None:
+                yield extended
+    elif name == "=":
+        extended = _unify(goal[1], goal[2], bindings)
+        if extended is not None:
+            yield extended
+    elif name == "\\=":
+        if _unify(goal[1], goal[2], bindings) is None:
+            yield bindings
+    elif name == "==":
+        if _freeze(_resolve(goal[1], bindings)) == _freeze(_resolve(goal[2], bindings)):
+            yield bindings
+    elif name == "\\==":
+        if _freeze(_resolve(goal[1], bindings)) != _freeze(_resolve(goal[2], bindings)):
+            yield bindings
+    else:
+        raise ValueError("unsupported guard: %s" % render(goal))
+
+
+class Argument:
+    def __init__(self, conclusion, rule, subarguments, defeasible, assumptions):
+        self.conclusion = conclusion
+        self.rule = rule
+        self.subarguments = subarguments
+        # whether the last rule is defeasible, so that the argument can be rebutted on its conclusion
+        self.defeasible = defeasible
+        # ~(Literal) patterns the argument relies on, anywhere in its tree
+        self.assumptions = assumptions
+        self.key = (rule, _freeze(conclusion), tuple(x.key for x in subarguments))
+
+    def rules(self):
+        return [self.rule] + [y for x in self.subarguments for y in x.rules()]
+
+    def all_subarguments(self):
+        return [self] + [y for x in self.subarguments for y in x.all_subarguments()]
+
+    def __str__(self):
+        return f"{render(self.conclusion)} [{', '.join(self.rules())}]"
+
+
+def parse(theory):
+    """Rules as (label, body, head, defeasible) and conflicts as (A, B) pairs"""
+    parser = _Parser(_tokenize(theory))
+    rules, conflicts = [], []
+    while not parser.done():
+        clause = parser.clause()
+        if isinstance(clause, tuple) and clause[0] == "conflict" and len(clause) == 3:
+            for a, b in itertools.product(clause[1], clause[2]):
+                conflicts.append((a, b))
+        elif isinstance(clause, tuple) and len(clause) == 4 and isinstance(clause[1], list):
+            rules.append(clause)
+        else:
+            raise ValueError("unsupported statement: %s" % render(clause))
+    return rules, conflicts
+
+
+def _matches(body, bindings, arguments):
+    """Bindings and sub-arguments for the literals of a rule body, and the ~ patterns left to assume"""
+    if not body:
+        yield bindings, [], []
+        return
+    literal, rest = body[0], body[1:]
+    if isinstance(literal, tuple) and literal[0] == "prolog":
+        for extended in _guard(literal[1], bindings):
+            yield from _matches(rest, extended, arguments)
+    elif isinstance(literal, tuple) and literal[0] == "~":
+        for extended, subarguments, assumptions in _matches(rest, bindings, arguments):
+            yield extended, subarguments, [literal[1]] + assumptions
+    else:
+        for argument in list(arguments):
+            extended = _unify(literal, argument.conclusion, bindings)
+            if extended is not None:
+                for final, subarguments, assumptions in _matches(rest, extended, arguments):
+                    yield final, [argument] + subarguments, assumptions
+
+
+def build_arguments(rules):
+    """All the arguments the rules support, built bottom-up until no new one appears"""
+    arguments, keys = [], set()
+    changed = True
+    while changed:
+        changed = False
+        for label, body, head, defeasible in rules:
+            for bindings, subarguments, assumptions in list(_matches(body, {}, arguments)):
+                conclusion = _resolve(head, bindings)
+                if not _ground(conclusion):
+                    continue
+                argument = Argument(
+                    conclusion,
+                    label if isinstance(label, str) else render(label),
+                    subarguments,
+                    defeasible,
+                    [_resolve(x, bindings) for x in assumptions] + [y for x in subarguments for y in x.assumptions],
+                )
+                if argument.key not in keys:
+                    keys.add(argument.key)
+                    arguments.append(argument)
+                    changed = True
+    return arguments
+
+
+def _conflicting(a, b, conflicts):
+    if a == ("-", b) or b == ("-", a):
+        return True
+    for x, y in conflicts:
+        for first, second in ((a, b), (b, a)):
+            bindings = _unify(x, first, {})
+            if bindings is not None and _unify(y, second, bindings) is not None:
+                return True
+    return False
+
+
+def attacks(arguments, conflicts):
+    """Attackers of each argument: undercutters of its ~ assumptions, and rebutters of its defeasible steps"""
+    attackers = {x.key: [] for x in arguments}
+    for target in arguments:
+        for attacker in arguments:
+            undercut = any(_unify(x, attacker.conclusion, {}) is not None for x in target.assumptions)
+            rebut = any(
+                x.defeasible and _conflicting(attacker.conclusion, x.conclusion, conflicts)
+                for x in target.all_subarguments()
+            )
+            if undercut or rebut:
+                attackers[target.key].append(attacker.key)
+    return attackers
+
+
+def grounded_labelling(arguments, attackers):
+    """IN, OUT or UND for each argument, by Dung's grounded semantics"""
+    labels = {}
+    changed = True
+    while changed:
+        changed = False
+        for argument in arguments:
+            if argument.key in labels:
+                continue
+            if all(labels.get(x) == "OUT" for x in attackers[argument.key]):
+                labels[argument.key] = "IN"
+                changed = True
+            elif any(labels.get(x) == "IN" for x in attackers[argument.key]):
+                labels[argument.key] = "OUT"
+                changed = True
+    return {x.key: labels.get(x.key, "UND") for x in arguments}
+
+
+def solve(theory):
+    """Arguments of theory grouped by grounded label, as {"IN": [...], "OUT": [...], "UND": [...]}"""
+    rules, conflicts = parse(theory)
+    arguments = build_arguments(rules)
+    labels = grounded_labelling(arguments, attacks(arguments, conflicts))
+    result = {"IN": [], "OUT": [], "UND": []}
+    for argument in arguments:
+        result[labels[argument.key]].append(argument)
+    return result
+
+
+def run(theory):
+    """Textual report of the grounded labelling of theory, one argument per line under its label"""
+    result = solve(theory)
+    return "\n".join(
+        f"{label}:\n" + "".join(f"  {x}\n" for x in arguments)
+        for label, arguments in result.items()
+    )
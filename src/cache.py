@@ -0,0 +1,47 @@
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def digest(*parts):
+    """Stable digest of JSON-serializable parts, the same across processes and runs"""
+    return hashlib.sha256(
+        json.dumps(parts, sort_keys=True, separators=(",", ":"), default=sorted).encode()
+    ).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe least recently used cache, whose entries expire ttl seconds after being stored"""
+
+    def __init__(self, size, ttl=None):
+        self._size = size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self._size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self._ttl if self._ttl else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,48 @@
+import re
+
+# Stands for the person id while querying and caching, so that cases that only
+# differ in the name of the person share their results
+PERSON = "case_person"
+
+_token = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"|\w+|\s+|.", re.DOTALL)
+_plain_atom = re.compile(r"[a-z]\w*")
+
+
+def _atom(token):
+    # quoted atoms are compared case-insensitively, and lose the quotes when they are not needed
+    if token.startswith("'"):
+        text = token[1:-1].lower()
+        return text if _plain_atom.fullmatch(text) else "'" + text + "'"
+    return token
+
+
+def normalize(fact, person=None):
+    """Canonical text of a fact: no whitespace outside quotes, a space after each argument
+    separator, no trailing period, quoted atoms lowercased, and the person id renamed to PERSON"""
+    fact = fact.strip().rstrip(".")
+    log = []
+    for token in _token.findall(fact):
+        if token.isspace():
+            continue
+        token = _atom(token)
+        if person is not None and token == person:
+            token = PERSON
+        log.append(", " if token == "," else token)
+    return "".join(log)
+
+
+def canonical_case(person, facts):
+    """Returns the canonical person id and the sorted canonical facts of a case"""
+    person = normalize(person)
+    return PERSON, sorted(set(normalize(x, person) for x in facts if x.strip()))
+
+
+def rename(value, person):
+    """Puts the person id back in place of PERSON, in any string of a (nested) result"""
+    if isinstance(value, str):
+        return re.sub(r"\b" + PERSON + r"\b", lambda _: person, value)
+    if isinstance(value, dict):
+        return {k: rename(v, person) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return type(value)(rename(x, person) for x in value)
+    return value
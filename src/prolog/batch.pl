@@ -0,0 +1,133 @@
+:- module(batch, [batch_has_right/10, directives_apply/4]).
+
+:- use_module(library(option)).
+:- use_module(library(time)).
+:- use_module('fact_context.pl').
+
+%% batch_has_right(+Session, +Targets, +Facts, +Explain, ?Right, +PersonId, ?Matter, +Options, -Results, -Incomplete)
+%
+% Evaluates has_right/5 in every Law-Module pair of Targets within a single fact context.
+% The facts stored for Session (none for no session) and Facts are asserted in all the target modules.
+% Results is a list of [Law, Module, Article, Matter, Right, Explanation], the explanation being
+% left unbound when Explain is false.
+% Options are:
+%   - abduce(Max, Abducibles, Seconds): goals that cannot be proved are abduced, at most Max
+%     along each proof, only for the Name/Arity in Abducibles and for Seconds from the start
+%     of each target
+%   - inferences(Limit): the search in each target stops after Limit inferences, keeping the
+%     results found so far
+%   - time_limit(Seconds): the search in each target is aborted after Seconds, dropping its results
+%   - rights(Rights): only the rights in Rights are searched, one at a time
+% Incomplete is a list of [Law, Module, Reason] for the targets whose search was cut short, Reason
+% being inference_limit, time_limit or resource_error(What).
+% Directive modules whose applicability gate fails for PersonId are skipped, unless abducing.
+%
+
+batch_has_right(Session, Targets, Facts, Explain, Right, PersonId, Matter, Options, Results, Incomplete) :-
+    case_facts(Session, Facts, Case),
+    abduction_facts(Options, Case, All),
+    findall(Module, member(_-Module, Targets), Modules),
+    with_facts(Modules, All,
+        Law-Module-Rows-Status,
+        (   member(Law-Module, Targets),
+            gate(Options, Law, Module, PersonId),
+            searched_right(Options, Right),
+            abduction_budget(Options),
+            target_rows(Options,
+                [Law, Module, Article, Matter, Right, Explanation],
+                target_right(Explain, Module, Right, Law, Article, PersonId, Matter, Explanation),
+                Rows, Status)
+        ),
+        Outcomes),
+    findall(Row, (member(_-_-TargetRows-_, Outcomes), member(Row, TargetRows)), Results),
+    findall([L, M, Reason], (member(L-M-_-Reason, Outcomes), Reason \== complete), Incomplete).
+
+%% directives_apply(+Modules, +Facts, +PersonId, -Outcomes)
+%
+% Evaluates the applicability gate of each directive module in Modules, Module_applies/1, with Facts
+% asserted. Outcomes is a list of [Module, Applies], Applies being false when the gate fails for
+% PersonId, and true when it holds or the module has none.
+%
+
+directives_apply(Modules, Facts, PersonId, Outcomes) :-
+    with_facts(Modules, Facts,
+        [Module, Applies],
+        (   member(Module, Modules),
+            (   applies(Module, PersonId)
+            ->  Applies = true
+            ;   Applies = false
+            )
+        ),
+        Outcomes).
+
+applies(Module, PersonId) :-
+    atom_concat(Module, '_applies', Gate),
+    (   current_predicate(Module:Gate/1)
+    ->  Goal =.. [Gate, PersonId],
+        once(Module:Goal)
+    ;   true
+    ).
+
+% abduction may supply the facts the gate is missing
+gate(Options, dir, Module, PersonId) :-
+    \+ option(abduce(_, _, _), Options), !,
+    applies(Module, PersonId).
+gate(_, _, _, _).
+
+searched_right(Options, Right) :-
+    (   option(rights(Rights), Options)
+    ->  member(Right, Rights)
+    ;   true
+    ).
+
+case_facts(none, Facts, Facts) :- !.
+case_facts(Session, Facts, All) :-
+    session_facts(Session, Stored),
+    append(Stored, Facts, All).
+
+target_right(true, Module, Right, Law, Article, PersonId, Matter, Explanation) :-
+    Module:explain(has_right(Right, Law, Article, PersonId, Matter), Explanation).
+target_right(false, Module, Right, Law, Article, PersonId, Matter, _) :-
+    Module:has_right(Right, Law, Article, PersonId, Matter).
+
+abduction_facts(Options, Facts, [abd_enabled|Facts]) :-
+    option(abduce(_, _, _), Options), !.
+abduction_facts(_, Facts, Facts).
+
+abduction_budget(Options) :-
+    (   option(abduce(Max, Abducibles, Seconds), Options)
+    ->  get_time(Now),
+        Deadline is Now + Seconds,
+        b_setval(abd_budget, Max),
+        b_setval(abd_abducibles, Abducibles),
+        b_setval(abd_deadline, Deadline)
+    ;   true
+    ).
+
+target_rows(Options, Template, Goal, Rows, Status) :-
+    option(inferences(Limit), Options, infinite),
+    option(time_limit(Seconds), Options, infinite),
+    catch(timed(Seconds, findall(Template-Result, limited(Limit, Goal, Result), Pairs)), Error, true),
+    (   var(Error)
+    ->  findall(Row, (member(Row-Outcome, Pairs), Outcome \== inference_limit_exceeded), Rows),
+        (   memberchk(_-inference_limit_exceeded, Pairs)
+        ->  Status = inference_limit
+        ;   Status = complete
+        )
+    ;   limit_reason(Error, Status)
+    ->  Rows = []
+    ;   throw(Error)
+    ).
+
+limited(infinite, Goal, true) :- !,
+    call(Goal).
+limited(Limit, Goal, Result) :-
+    call_with_inference_limit(Goal, Limit, Result).
+
+timed(infinite, Goal) :- !,
+    call(Goal).
+timed(Seconds, Goal) :-
+    call_with_time_limit(Seconds, Goal).
+
+limit_reason(time_limit_exceeded, time_limit).
+limit_reason(error(resource_error(What), _), resource_error(What)).
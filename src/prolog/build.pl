@@ -0,0 +1,21 @@
+% Compiles the directive and implementation modules into quick load files.
+% The included utils.pl and meta_interpreter.pl are compiled along with each module.
+%
+%   swipl src/prolog/build.pl
+%
+% The .qlf files are tied to the SWI-Prolog version that produced them, and
+% are only used by swi_interface.py while they are newer than their sources.
+
+:- initialization(main, main).
+
+:- prolog_load_context(directory, Dir),
+   asserta(kb_root(Dir)).
+
+kb_source(File) :-
+    kb_root(Root),
+    atom_concat(Root, '/directives/*/*.pl', Pattern),
+    expand_file_name(Pattern, Files),
+    member(File, Files).
+
+main :-
+    forall(kb_source(File), qcompile(File)).
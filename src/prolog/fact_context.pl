@@ -0,0 +1,87 @@
+:- module(fact_context, [with_facts/5, session_facts/2, update_session_facts/3, drop_session/1]).
+
+:- meta_predicate with_facts(+, +, ?, 0, -).
+
+:- dynamic session_fact/2.
+
+%% with_facts(+Modules, +Facts, ?Template, :Goal, -Results)
+%
+% Collects all the instances of Template for which Goal holds, with Facts asserted in Modules,
+% either a single module or a list of modules.
+% The facts are only visible while Goal runs, and are discarded even if Goal raises an exception,
+% together with the answers tabled from them.
+%
+
+:- if(catch(predicate_property(system:snapshot(_), defined), _, fail)).
+
+% Changes made inside a snapshot are local to the running thread and
+% are dropped as a whole when it ends.
+with_facts(Modules, Facts, Template, Goal, Results) :-
+    setup_call_cleanup(
+        true,
+        snapshot((
+            assert_facts(Modules, Facts),
+            findall(Template, Goal, Results)
+        )),
+        abolish_private_tables
+    ).
+
+:- else.
+
+% No transactions in this build, fact-bearing queries are serialized.
+with_facts(Modules, Facts, Template, Goal, Results) :-
+    with_mutex(fact_context,
+        setup_call_cleanup(
+            assert_facts(Modules, Facts),
+            findall(Template, Goal, Results),
+            (   retract_facts(Modules, Facts),
+                abolish_private_tables
+            )
+        )).
+
+:- endif.
+
+assert_facts(Modules, Facts) :-
+    forall((target_module(Modules, Module), member(Fact, Facts)), assertz(Module:Fact)).
+
+retract_facts(Modules, Facts) :-
+    forall((target_module(Modules, Module), member(Fact, Facts)), ignore(retract(Module:(Fact :- true)))).
+
+target_module(Modules, Module) :-
+    is_list(Modules), !,
+    member(Module, Modules).
+target_module(Module, Module).
+
+%% session_facts(+Session, -Facts)
+%
+% Facts is the list of the facts stored for Session.
+%
+
+session_facts(Session, Facts) :-
+    findall(Fact, session_fact(Session, Fact), Facts).
+
+%% update_session_facts(+Session, +Added, +Removed)
+%
+% Applies the difference between two turns to the facts stored for Session.
+%
+
+update_session_facts(Session, Added, Removed) :-
+    with_mutex(fact_context_sessions, (
+        forall(member(Fact, Removed), remove_session_fact(Session, Fact)),
+        forall(member(Fact, Added), assertz(session_fact(Session, Fact)))
+    )).
+
+%% drop_session(+Session)
+%
+% Forgets all the facts stored for Session.
+%
+
+drop_session(Session) :-
+    retractall(session_fact(Session, _)).
+
+remove_session_fact(Session, Fact) :-
+    (   clause(session_fact(Session, Stored), true, Ref),
+        Stored =@= Fact
+    ->  erase(Ref)
+    ;   true
+    ).
@@ -1,34 +1,69 @@
-solve((A,B), Result) :- !,
-    solve(A, ARes),
-    solve(B, BRes),
-    append(ARes, BRes, Result).
+:- dynamic abd_enabled/0.
 
-solve((A;_), Result) :-
-    solve(A, Result).
+% Explanations are built with difference lists: solve(Goal, Result, Tail) puts
+% the explanation of Goal in front of Tail, so conjunctions are joined without
+% copying the explanations of their conjuncts.
+solve(Goal, Result) :-
+    solve(Goal, Result, []).
 
-solve((_;B), Result) :- !,
-    solve(B, Result).
+solve((A,B), Result, Tail) :- !,
+    solve(A, Result, Middle),
+    solve(B, Middle, Tail).
 
-solve(member(A, B), [system_predicate]) :- !,
+solve((A;_), Result, Tail) :-
+    solve(A, Result, Tail).
+
+solve((_;B), Result, Tail) :- !,
+    solve(B, Result, Tail).
+
+solve(member(A, B), [system_predicate|Tail], Tail) :- !,
     call(member(A, B)).
 
-solve(\+(A), [not(A)]) :- !,
+solve(\+(A), [not(A)|Tail], Tail) :- !,
     call(\+(A)).
 
-solve((A)\=(B), [doNotUnify(A, B)]) :- !,
+solve((A)\=(B), [doNotUnify(A, B)|Tail], Tail) :- !,
     call((A)\=(B)).
 
-solve(A, [system_predicate]) :-
+solve(A, [system_predicate|Tail], Tail) :-
     predicate_property(A, built_in), !,
     call(A).
 
-solve(A, [A|[Res]]) :-
+solve(A, [A, Res|Tail], Tail) :-
     clause(A,B),
-    solve(B, Res).
+    solve(B, Res, []).
 
-solve(A, [abduced(A)]) :-
+solve(A, [abduced(A)|Tail], Tail) :-
     abd_enabled,
     A \= has_right(_, _, _, _),
     A \= has_right(_, _, _, _, _),
+    abd_abducible(A),
     \+ clause(A, _),
-    \+ call(A).
+    \+ call(A),
+    abd_consume.
+
+% Abduction is bounded by the global variables set by batch:abduction_budget/1
+% for each target of batch_has_right/10: abd_abducibles is the list of the
+% Name/Arity of the goals that can be abduced, abd_budget the number of goals
+% that can still be abduced along the current branch, and abd_deadline the time
+% after which no more goals are abduced. Unset variables leave abduction
+% unrestricted.
+abd_abducible(A) :-
+    (   nb_current(abd_abducibles, Abducibles)
+    ->  functor(A, Name, Arity),
+        memberchk(Name/Arity, Abducibles)
+    ;   true
+    ).
+
+abd_consume :-
+    (   nb_current(abd_budget, Budget)
+    ->  Budget > 0,
+        Left is Budget - 1,
+        b_setval(abd_budget, Left)
+    ;   true
+    ),
+    (   nb_current(abd_deadline, Deadline)
+    ->  get_time(Now),
+        Now < Deadline
+    ;   true
+    ).
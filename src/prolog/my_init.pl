@@ -15,3 +15,9 @@
 :- dynamic prolog_stack:stack_guard/1.
 :- multifile prolog_stack:stack_guard/1.
 prolog_stack:stack_guard(_).
+
+% run queries against temporary case facts
+:- use_module('fact_context.pl').
+:- use_module('batch.pl').
+:- use_module('right_tables.pl').
+:- use_module('rule_graph.pl').
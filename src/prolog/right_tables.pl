@@ -0,0 +1,30 @@
+:- module(right_tables, [table_rights/1, untable_rights/1]).
+
+% The right predicates that are re-derived inside other rules, e.g. by
+% auxiliary_right_checked/5 and right_property_checked/5.
+tabled_predicate(has_right/4).
+tabled_predicate(has_right/5).
+tabled_predicate(auxiliary_right_checked/5).
+tabled_predicate(right_property_checked/5).
+
+%% table_rights(+Module)
+%
+% Tables the right predicates defined in Module.
+% Tables are private to each thread, and fact contexts abolish them when they end,
+% so answers never outlive the facts they were derived from.
+%
+
+table_rights(Module) :-
+    forall(defined_predicate(Module, PI), Module:table(PI)).
+
+%% untable_rights(+Module)
+%
+% Removes the tabling installed by table_rights/1.
+%
+
+untable_rights(Module) :-
+    forall(defined_predicate(Module, PI), Module:untable(PI)).
+
+defined_predicate(Module, Name/Arity) :-
+    tabled_predicate(Name/Arity),
+    current_predicate(Module:Name/Arity).
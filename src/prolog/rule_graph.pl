@@ -0,0 +1,215 @@
+:- module(rule_graph, [right_requirements/2, right_dependencies/3]).
+
+:- use_module(library(apply)).
+:- use_module(library(lists)).
+:- use_module(library(yall)).
+
+:- thread_local requirement_memo/3.
+
+%% right_requirements(+Module, -Requirements)
+%
+% Walks the rules of Module down from each has_right/4 clause with clause/2.
+% Requirements is a list of [Right, Predicates], one for each has_right/4 clause, Right being the right
+% in the head of the clause (unbound if it has none) and Predicates the sorted Name/Arity atoms of the
+% predicates that must have facts for the clause to hold.
+%
+% Predicates without clauses can only hold through asserted facts, and so do dynamic ones. A goal
+% requires the predicates required along every one of its alternatives, so negations, collecting
+% built-ins and recursive calls require nothing: the requirements can be fewer than the real ones,
+% never more.
+%
+
+right_requirements(Module, Requirements) :-
+    retractall(requirement_memo(_, _, _)),
+    findall([Right, Predicates],
+        (   clause(Module:has_right(_, _, Right, _), Body),
+            requirements(Body, Module, [], Set),
+            maplist(indicator_atom, Set, Atoms),
+            sort(Atoms, Predicates)
+        ),
+        Requirements),
+    retractall(requirement_memo(_, _, _)).
+
+indicator_atom(Name/Arity, Atom) :-
+    format(atom(Atom), "~w/~w", [Name, Arity]).
+
+requirements(Goal, _, _, []) :-
+    var(Goal), !.
+requirements(Module:Goal, _, Stack, Set) :- !,
+    requirements(Goal, Module, Stack, Set).
+requirements((A, B), Module, Stack, Set) :- !,
+    requirements(A, Module, Stack, SetA),
+    requirements(B, Module, Stack, SetB),
+    union(SetA, SetB, Set).
+requirements((If -> Then ; Else), Module, Stack, Set) :- !,
+    requirements((If, Then), Module, Stack, SetThen),
+    requirements(Else, Module, Stack, SetElse),
+    intersection(SetThen, SetElse, Set).
+requirements((A ; B), Module, Stack, Set) :- !,
+    requirements(A, Module, Stack, SetA),
+    requirements(B, Module, Stack, SetB),
+    intersection(SetA, SetB, Set).
+requirements((If -> Then), Module, Stack, Set) :- !,
+    requirements((If, Then), Module, Stack, Set).
+requirements(once(Goal), Module, Stack, Set) :- !,
+    requirements(Goal, Module, Stack, Set).
+requirements(call(Goal), Module, Stack, Set) :- !,
+    requirements(Goal, Module, Stack, Set).
+requirements(Goal, Module, Stack, Set) :-
+    functor(Goal, Name, Arity),
+    (   memberchk(Name/Arity, Stack)
+    ->  Set = []
+    ;   free_predicate(Module:Goal)
+    ->  Set = []
+    ;   requirement_memo(Module, Key, Set),
+        Key =@= Goal
+    ->  true
+    ;   predicate_requirements(Goal, Module, [Name/Arity|Stack], Set),
+        assertz(requirement_memo(Module, Goal, Set))
+    ).
+
+% built-ins, library predicates and negations hold or fail regardless of the case facts
+free_predicate(_:Goal) :-
+    control_goal(Goal), !.
+free_predicate(Module:Goal) :-
+    (   predicate_property(Module:Goal, built_in)
+    ;   predicate_property(Module:Goal, foreign)
+    ;   predicate_property(Module:Goal, imported_from(_))
+    ), !.
+
+control_goal(\+ _).
+control_goal(findall(_, _, _)).
+control_goal(findall(_, _, _, _)).
+control_goal(forall(_, _)).
+control_goal(aggregate_all(_, _, _)).
+control_goal(ignore(_)).
+
+predicate_requirements(Goal, Module, [PI|Stack], Set) :-
+    catch(
+        findall(ClauseSet,
+            (   clause(Module:Goal, Body),
+                requirements(Body, Module, [PI|Stack], ClauseSet)
+            ),
+            ClauseSets),
+        _,
+        % code that cannot be inspected is assumed to need nothing
+        ClauseSets = [[]]),
+    (   ClauseSets == []
+    ->  Set = [PI]
+    ;   predicate_property(Module:Goal, dynamic)
+    ->  intersect_all([[PI]|ClauseSets], Set)
+    ;   intersect_all(ClauseSets, Set)
+    ).
+
+intersect_all([Set], Set) :- !.
+intersect_all([Set|Sets], Common) :-
+    intersect_all(Sets, Rest),
+    intersection(Set, Rest, Common).
+
+%% right_dependencies(+Module, -Gate, -Dependencies)
+%
+% Dependencies is a list of [Right, Predicates], one for each has_right/4 clause of Module, Right being
+% as in right_requirements/2 and Predicates the sorted Name/Arity atoms of all the predicates that can
+% hold through facts and that the clause may call, directly or not, positively or under negation.
+% Gate is the same for the has_right/5 clauses, leaving out their calls to has_right/4.
+% '*' stands for goals that are only known at run time, which may call anything.
+%
+% A right whose clauses depend on none of the predicates of some facts, nor does the gate, has the
+% same answers with or without those facts.
+%
+
+right_dependencies(Module, Gate, Dependencies) :-
+    findall(Call,
+        (   clause(Module:has_right(_, _, _, _, _), Body),
+            goal_calls(Body, Module, Calls),
+            member(Call, Calls),
+            Call \= Module:has_right/4
+        ),
+        GateCalls),
+    reachable_facts(GateCalls, Gate),
+    findall([Right, Predicates],
+        (   clause(Module:has_right(_, _, Right, _), Body),
+            goal_calls(Body, Module, Calls),
+            reachable_facts(Calls, Predicates)
+        ),
+        Dependencies).
+
+reachable_facts(Calls, Predicates) :-
+    reach(Calls, [], Reached),
+    findall(Atom,
+        (   member(Called, Reached),
+            fact_predicate(Called, Atom)
+        ),
+        Atoms),
+    sort(Atoms, Predicates).
+
+fact_predicate(unknown, '*') :- !.
+fact_predicate(Module:Name/Arity, Atom) :-
+    functor(Head, Name, Arity),
+    (   predicate_property(Module:Head, dynamic)
+    ->  true
+    ;   \+ predicate_property(Module:Head, defined)
+    ),
+    indicator_atom(Name/Arity, Atom).
+
+reach([], Reached, Reached).
+reach([Called|Calls], Seen, Reached) :-
+    (   memberchk(Called, Seen)
+    ->  reach(Calls, Seen, Reached)
+    ;   Called = Module:Name/Arity
+    ->  functor(Head, Name, Arity),
+        findall(Call,
+            (   catch(clause(Module:Head, Body), _, fail),
+                goal_calls(Body, Module, BodyCalls),
+                member(Call, BodyCalls)
+            ),
+            New),
+        append(New, Calls, Work),
+        reach(Work, [Called|Seen], Reached)
+    ;   reach(Calls, [Called|Seen], Reached)
+    ).
+
+%% goal_calls(+Goal, +Module, -Calls)
+%
+% Calls is the list of the Module:Name/Arity of the user predicates that Goal calls directly,
+% looking inside control constructs and the goal arguments of meta-predicates.
+%
+
+goal_calls(Goal, _, [unknown]) :-
+    var(Goal), !.
+goal_calls(Module:Goal, _, Calls) :- !,
+    goal_calls(Goal, Module, Calls).
+goal_calls(Goal, Module, Calls) :-
+    control_construct(Goal), !,
+    Goal =.. [_|Goals],
+    maplist([G, C]>>goal_calls(G, Module, C), Goals, Nested),
+    append(Nested, Calls).
+goal_calls(Goal, Module, Calls) :-
+    predicate_property(Module:Goal, meta_predicate(Spec)), !,
+    Goal =.. [_|Args],
+    Spec =.. [_|Specs],
+    foldl([Arg, S, C0, C]>>(meta_argument_calls(S, Arg, Module, C1), append(C0, C1, C)), Args, Specs, [], Calls).
+goal_calls(Goal, Module, []) :-
+    free_predicate(Module:Goal), !.
+goal_calls(Goal, Module, [Module:Name/Arity]) :-
+    functor(Goal, Name, Arity).
+
+control_construct((_, _)).
+control_construct((_ ; _)).
+control_construct((_ -> _)).
+control_construct((_ *-> _)).
+
+meta_argument_calls(0, Goal, Module, Calls) :- !,
+    goal_calls(Goal, Module, Calls).
+meta_argument_calls(^, Goal, Module, Calls) :- !,
+    strip_existential(Goal, Inner),
+    goal_calls(Inner, Module, Calls).
+meta_argument_calls(N, _, _, [unknown]) :-
+    integer(N), !.
+meta_argument_calls(_, _, _, []).
+
+strip_existential(Goal, Goal) :-
+    var(Goal), !.
+strip_existential(_^Goal, Inner) :- !,
+    strip_existential(Goal, Inner).
+strip_existential(Goal, Goal).
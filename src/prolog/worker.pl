@@ -0,0 +1,84 @@
+% Worker process of the out-of-process backend of swi_interface.py.
+%
+%   swipl src/prolog/worker.pl
+%
+% Reads one JSON request per line from standard input, {"goal": Text}, runs
+% the goal once and writes one JSON reply per line to standard output:
+%   - {"status": true, "bindings": {Name: Value}} when the goal succeeds
+%   - {"status": false} when it fails
+%   - {"status": "error", "message": Text} when it raises an exception
+% Lists become JSON arrays, numbers stay numbers and any other term is written
+% in canonical functional notation, as swi_interface._render does.
+
+:- use_module(library(http/json)).
+
+:- consult('my_init.pl').
+
+:- initialization(main, main).
+
+main :-
+    set_stream(user_input, encoding(utf8)),
+    set_stream(user_output, encoding(utf8)),
+    serve.
+
+serve :-
+    json_read_dict(user_input, Request, [end_of_file(end_of_file)]),
+    (   Request == end_of_file
+    ->  true
+    ;   reply(Request, Reply),
+        json_write_dict(user_output, Reply, [width(0)]),
+        nl(user_output),
+        flush_output(user_output),
+        serve
+    ).
+
+reply(Request, Reply) :-
+    catch(
+        (   term_string(Goal, Request.goal, [variable_names(Names)]),
+            % anything the goal prints would break the replies
+            (   with_output_to(string(_), once(Goal))
+            ->  bindings(Names, Bindings),
+                Reply = _{status: true, bindings: Bindings}
+            ;   Reply = _{status: false}
+            )
+        ),
+        Error,
+        (   error_message(Error, Message),
+            Reply = _{status: error, message: Message}
+        )).
+
+error_message(Error, Message) :-
+    format(string(Message), "~q", [Error]).
+
+bindings(Names, Bindings) :-
+    findall(Name-Value, (member(Name=Term, Names), to_json(Term, Value)), Pairs),
+    dict_pairs(Bindings, _, Pairs).
+
+to_json(Term, "_") :-
+    var(Term), !.
+to_json(Term, Values) :-
+    is_list(Term), !,
+    maplist(to_json, Term, Values).
+to_json(Term, Term) :-
+    number(Term), !.
+to_json(Term, Text) :-
+    render(Term, Text).
+
+render(Term, "_") :-
+    var(Term), !.
+render(Term, Text) :-
+    is_list(Term), !,
+    maplist(render, Term, Items),
+    atomic_list_concat(Items, ', ', Inner),
+    format(string(Text), "[~w]", [Inner]).
+render(Term, Text) :-
+    compound(Term), !,
+    compound_name_arguments(Term, Name, Args),
+    (   Args == []
+    ->  atom_string(Name, Text)
+    ;   maplist(render, Args, Items),
+        atomic_list_concat(Items, ', ', Inner),
+        format(string(Text), "~w(~w)", [Name, Inner])
+    ).
+render(Term, Text) :-
+    format(string(Text), "~w", [Term]).
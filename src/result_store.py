@@ -0,0 +1,70 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+
+root = os.path.abspath(os.path.dirname(__file__))
+
+RESULT_STORE = os.environ.get("CROSSJUSTICE_RESULT_STORE", "")
+
+
+def kb_version():
+    """Digest of the Prolog sources and manifest, which any stored result depends on"""
+    h = hashlib.sha256()
+    prolog = os.path.join(root, "prolog")
+    for dirpath, dirnames, filenames in os.walk(prolog):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.endswith((".pl", ".json")):
+                path = os.path.join(dirpath, name)
+                h.update(os.path.relpath(path, prolog).replace("\\", "/").encode())
+                with open(path, "rb") as f:
+                    h.update(f.read())
+    return h.hexdigest()
+
+
+class ResultStore:
+    """SQLite store of computed results, whose entries are dropped when the knowledge base changes"""
+
+    def __init__(self, path, version):
+        self._version = version
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "version TEXT NOT NULL, kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (version, kind, key))"
+            )
+            self._connection.execute("DELETE FROM results WHERE version != ?", (version,))
+
+    def get(self, kind, key):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM results WHERE version = ? AND kind = ? AND key = ?",
+                (self._version, kind, key),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, kind, key, value):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results (version, kind, key, value) VALUES (?, ?, ?, ?)",
+                (self._version, kind, key, json.dumps(value)),
+            )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Returns the store configured with CROSSJUSTICE_RESULT_STORE, or None when it is not set"""
+    global _store
+    if not RESULT_STORE:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = ResultStore(RESULT_STORE, kb_version())
+        return _store
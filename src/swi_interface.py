@@ -1,10 +1,61 @@
 import re
+import copy
 import json
 import os
+import zlib
+import itertools
+import threading
 import pyswip, ctypes
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, closing, contextmanager
+
+from cache import LRUCache, digest
+from canonical import canonical_case, rename
+import input_facts
+from result_store import get_store
+from worker_pool import WorkerPool
 
 root = os.path.abspath(os.path.dirname(__file__))
 
+ENGINE_POOL_SIZE = int(os.environ.get("CROSSJUSTICE_ENGINES", os.cpu_count() or 1))
+MODULE_LIMIT = int(os.environ.get("CROSSJUSTICE_MODULES", 0))
+# tables only speed up queries without explanations: solve/3 walks the clauses with clause/2 and does not
+# go through the tables
+TABLING = os.environ.get("CROSSJUSTICE_TABLING", "").lower() in ("1", "true")
+SESSION_LIMIT = 256
+QUERY_CACHE_SIZE = int(os.environ.get("CROSSJUSTICE_CACHE_SIZE", 1024))
+QUERY_CACHE_TTL = float(os.environ.get("CROSSJUSTICE_CACHE_TTL", 3600))
+ABDUCTION_LITERALS = int(os.environ.get("CROSSJUSTICE_ABDUCTION_LITERALS", 3))
+ABDUCTION_INFERENCES = int(os.environ.get("CROSSJUSTICE_ABDUCTION_INFERENCES", 1000000))
+ABDUCTION_TIME = float(os.environ.get("CROSSJUSTICE_ABDUCTION_TIME", 5))
+INFERENCE_LIMIT = int(os.environ.get("CROSSJUSTICE_INFERENCE_LIMIT", 100000000))
+TIME_LIMIT = float(os.environ.get("CROSSJUSTICE_TIME_LIMIT", 30))
+STACK_LIMIT = int(os.environ.get("CROSSJUSTICE_STACK_LIMIT", 1 << 30))
+PRUNING = os.environ.get("CROSSJUSTICE_PRUNING", "1").lower() in ("1", "true")
+# "engines" runs the queries in this process, "processes" on a pool of swipl worker processes
+BACKEND = os.environ.get("CROSSJUSTICE_BACKEND", "engines")
+WORKER_POOL_SIZE = int(os.environ.get("CROSSJUSTICE_WORKERS", os.cpu_count() or 1))
+
+with open(os.path.join(root, "prolog/manifest.json")) as manifest:
+    _manifest = json.load(manifest)
+
+
+def _abducibles():
+    """Name/Arity of the facts documented in facts.pl and input_facts, the only goals that can be abduced"""
+    with open(os.path.join(root, "prolog/facts.pl")) as src:
+        docs = [src.read()] + [x for x in vars(input_facts).values() if isinstance(x, str)]
+    return sorted(
+        set(
+            f"{name}/{len(args.split(','))}"
+            for doc in docs
+            for name, args in re.findall(r"^%%\s*([a-z]\w*)\((.*)\)\s*$", doc, re.MULTILINE)
+        )
+    )
+
+
+ABDUCIBLES = _abducibles()
+
 class PrologMT(pyswip.Prolog):
     """Multi-threaded (one-to-one) pyswip.Prolog ad-hoc reimpl"""
 
@@ -30,24 +81,54 @@ class PrologMT(pyswip.Prolog):
         elif pengine_id == -2:
             print("{WARN} Single-threaded swipl build, beware!")
 
+    # pyswip tracks open queries in a class attribute, which would make
+    # queries running on different engines look nested to each other
+    _local = threading.local()
+
     class _QueryWrapper(pyswip.Prolog._QueryWrapper):
+        def __init__(self):
+            if getattr(PrologMT._local, "query_is_open", False):
+                raise pyswip.prolog.NestedQueryError("The last query was not closed")
+
         def __call__(self, *args, **kwargs):
             PrologMT._init_prolog_thread()
-            return super().__call__(*args, **kwargs)
+            PrologMT._local.query_is_open = True
+            try:
+                yield from super().__call__(*args, **kwargs)
+            finally:
+                PrologMT._local.query_is_open = False
+
+
+class EnginePool:
+    """Fixed set of Prolog engines, each one attached to its own worker thread"""
+
+    def __init__(self, size, initializer=None):
+        self._engines = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"prolog-engine-{i}", initializer=initializer)
+            for i in range(max(1, size))
+        ]
+        self._next = itertools.count()
+
+    def _engine(self, affinity):
+        if affinity is None:
+            return self._engines[next(self._next) % len(self._engines)]
+        if isinstance(affinity, int):
+            return self._engines[affinity % len(self._engines)]
+        return self._engines[zlib.crc32(str(affinity).encode()) % len(self._engines)]
+
+    def submit(self, execute, *args, affinity=None, **kwargs):
+        return self._engine(affinity).submit(execute, *args, **kwargs)
+
+    def run(self, execute, *args, affinity=None, **kwargs):
+        return self.submit(execute, *args, affinity=affinity, **kwargs).result()
 
 
 def source_path(directive, implementation):
-    dict = {
-        "pl": "polish_implementation",
-        "it": "italian_implementation",
-        "nl": "dutch_implementation",
-        "bg": "bulgarian_implementation",
-        "dir": directive,
-        "directive": directive,
-    }
+    modules = _manifest[directive]["modules"]
+    source = modules["dir" if implementation == "directive" else implementation]
 
     return os.path.join(
-        root, f"prolog/directives/{directive}/{dict[implementation]}.pl"
+        root, f"prolog/directives/{directive}/{source}"
     ).replace("\\", "/")
 
 
@@ -57,84 +138,402 @@ def nationality(law):
         "_pl": "pl",
         "_nl": "nl",
         "_bg": "bg",
+        "_es": "es",
         "": "directive",
     }
     return next((y for x, y in element.items() if x in law))
 
 
-def _generate_interpreter():
-    def _add_directive(swipl, root, directive, implementations):
-        def _impl(directive, implementation):
+# comment block following the header of a rule: title, text and optional $...$ comment
+_article_block = re.compile(r"\n%\n%\s?([^%]+?(?=%))([\S\s%\n]+?)(?=\n[a-z]|\$)(\$[\s\S]*?\$)?")
+_articles = {}
+_articles_lock = threading.Lock()
+
+
+def _article_blocks(path, type):
+    """Parses once the documented rules of type in a source, in order, as (rest of the header line, [title, text, comment])"""
+    with _articles_lock:
+        if (path, type) not in _articles:
+            with open(path, "r") as pl_src:
+                law_text = pl_src.read()
+            blocks = []
+            for header in re.finditer(r"(?=" + re.escape(type) + r"\(_(.+))", law_text):
+                res = _article_block.match(law_text, header.end(1))
+                if res is not None:
+                    title = res.group(1).replace("%", "")
+                    text = res.group(2).replace("%", " ")
+                    comment = (res.group(3) or "").replace("%", " ").replace("$", "")
+                    blocks.append((header.group(1), [title, text, comment]))
+            _articles[(path, type)] = blocks
+        return _articles[(path, type)]
+
+
+def article_text(type, law, article):
+    """Title, text and comment of the first documented rule of type in the module of law whose header starts with article"""
+    directive = law[:-3] if not law[-1].isdigit() else law
+    path = source_path(directive, nationality(law))
+    return next(
+        (list(block) for header, block in _article_blocks(path, type) if header.startswith(article) and header != article),
+        "",
+    )
 
-            module = source_path(directive, implementation)
-            next(swipl.query(f"use_module('{module}',[])"))
 
-            return (
-                implementation,
-                directive
-                if implementation == "dir"
-                else directive + "_" + implementation,
-            )
+def _compiled(source):
+    """Returns the quick load file built from source by prolog/build.pl, if it is up to date"""
+    compiled = os.path.splitext(source)[0] + ".qlf"
+    if not os.path.exists(compiled):
+        return None
+    included = [os.path.join(root, "prolog", x) for x in ["utils.pl", "meta_interpreter.pl"]]
+    newest = max(os.path.getmtime(x) for x in [source] + included)
+    return compiled if os.path.getmtime(compiled) >= newest else None
+
+
+def _load_module(swipl, source):
+    compiled = _compiled(source)
+    if compiled is not None:
+        try:
+            next(swipl.query(f"use_module('{compiled}',[])"))
+            return compiled
+        except pyswip.prolog.PrologError as e:
+            print("{WARN} unable to load %s, using the sources: %s" % (compiled, e))
+    next(swipl.query(f"use_module('{source}',[])"))
+    return source
+
+
+class ModuleRegistry:
+    """Directive and implementation modules of the manifest, loaded the first time they are queried"""
+
+    def __init__(self, swipl, manifest, limit=0, tabling=False):
+        self._swipl = swipl
+        self._tabling = tabling
+        self._sources = {
+            (law, directive if law == "dir" else f"{directive}_{law}"): source_path(directive, law)
+            for directive, entry in manifest.items()
+            if entry["enabled"]
+            for law in entry["modules"]
+        }
+        self._limit = limit
+        self._loaded = OrderedDict()
+        self._users = Counter()
+        self._lock = threading.Lock()
+
+    def mappings(self):
+        return list(self._sources)
+
+    def sources(self):
+        return dict(self._sources)
+
+    @property
+    def tabled(self):
+        return self._tabling
+
+    @contextmanager
+    def using(self, law, module):
+        key = (law, module)
+        with self._lock:
+            if key not in self._loaded:
+                self._loaded[key] = _load_module(self._swipl, self._sources[key])
+                if self._tabling:
+                    next(self._swipl.query(f"table_rights({module})"))
+                print("{INFO} loaded module: %s" % module)
+            self._loaded.move_to_end(key)
+            self._users[key] += 1
+            self._evict()
+        try:
+            yield module
+        finally:
+            with self._lock:
+                self._users[key] -= 1
+
+    def tabling(self, enabled):
+        """Switches tabling of the right predicates, for the loaded modules and the ones loaded later"""
+        with self._lock:
+            if enabled != self._tabling:
+                for _, module in self._loaded:
+                    next(self._swipl.query(f"{'table' if enabled else 'untable'}_rights({module})"))
+            self._tabling = enabled
+
+    def _evict(self):
+        # modules are unloaded least recently used first, and only while no query runs on them
+        if not self._limit:
+            return
+        for law, module in [x for x in self._loaded if not self._users[x]]:
+            if len(self._loaded) <= self._limit:
+                break
+            files = [self._sources[(law, module)], self._loaded.pop((law, module))]
+            next(self._swipl.query(f"forall(member(F, {files}), unload_file(F))"))
+            print("{INFO} unloaded module: %s" % module)
 
-        return [_impl(directive, "dir")] + [
-            _impl(directive, x) for x in implementations
-        ]
 
+def _generate_interpreter():
     swipl = PrologMT()
     # root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
     swipl.consult(os.path.join(root, "prolog/my_init.pl").replace("\\", "/"))
 
-    return (
-        swipl,
-        _add_directive(swipl, root, "directive_2010_64", ["it", "nl", "pl", "bg"])
-        # + _add_directive(swipl, root, "directive_2016_800", ["it", "nl", "pl", "bg"])
-        + _add_directive(swipl, root, "directive_2012_13", ["it", "nl", "pl", "bg"])
-        + _add_directive(swipl, root, "directive_2016_343", ["it", "nl", "pl", "bg"])
-        + _add_directive(swipl, root, "directive_2013_48", ["it", "nl", "pl", "bg"])
-        # + _add_directive(swipl, root, "directive_2016_1919", ["it", "nl", "pl", "bg"]),
-    )
+    return swipl, ModuleRegistry(swipl, _manifest, MODULE_LIMIT, TABLING)
 
 
-_swipl, _mappings = _generate_interpreter()
+def _govern_engine():
+    """Caps the stacks of the engine of the calling thread"""
+    if STACK_LIMIT:
+        _solve(f"set_prolog_flag(stack_limit, {STACK_LIMIT})")
 
 
-def _json_clean_explanation(expl):
-    def _clean_explanation(tmp_list):
-        log = []
-        for tmp in tmp_list:
-            if isinstance(tmp, list):
-                log.append(_clean_explanation(tmp))
-            else:
-                tmp = re.sub("Variable\(\d+\)", "_", str(tmp))
-                if (
-                    tmp != "system_predicate"
-                    and not tmp.startswith("auxiliary_right_scope")
-                    and not tmp.startswith("right_property_scope")
-                ):
-                    log.append(tmp)
-        return log
+_swipl, _registry = _generate_interpreter()
+_pool = EnginePool(ENGINE_POOL_SIZE, _govern_engine)
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+_results = LRUCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+_limits = Counter()
+_limits_lock = threading.Lock()
+_requirements = {}
+_dependencies = {}
+_requirements_lock = threading.Lock()
+_previous = LRUCache(SESSION_LIMIT * 8, QUERY_CACHE_TTL)
+
 
-    return json.dumps(_clean_explanation(expl))
+def _atom(value):
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
 
 
-def _with_facts(execute, facts, module):
-    for item in facts:
-        _swipl.assertz(module + ":" + item)
+def _start_workers():
+    """Worker processes with all the enabled modules loaded, and the same limits and tabling as the engines"""
+    setup = [f"set_prolog_flag(stack_limit, {STACK_LIMIT})"] if STACK_LIMIT else []
+    files = [f"{_atom(_compiled(x) or x)}-{_atom(x)}" for x in _registry.sources().values()]
+    setup.append(f"forall(member(F-S, [{', '.join(files)}]), catch(use_module(F, []), _, use_module(S, [])))")
+    if _registry.tabled:
+        setup.append(_tabling_goal(True))
+    return WorkerPool(WORKER_POOL_SIZE, setup)
 
-    result = execute()
 
-    for item in facts:
-        _swipl.retractall(module + ":" + item)
+def _tabling_goal(enabled):
+    modules = ", ".join(module for _, module in _registry.mappings())
+    return f"forall(member(M, [{modules}]), {'table' if enabled else 'untable'}_rights(M))"
 
-    return result
+
+_workers = _start_workers() if BACKEND == "processes" else None
+
+
+def set_tabling(enabled):
+    """Turns tabling of has_right and of the checked auxiliary rights on or off, to be called between queries.
+    Only queries without explanations use the tables, the meta-interpreter reads the clauses themselves"""
+    if _workers is not None and enabled != _registry.tabled:
+        _workers.broadcast(_tabling_goal(enabled))
+    _registry.tabling(enabled)
+
+
+def _sync_session(session, facts):
+    """Brings the Prolog fact store of a session in line with facts, sending only the difference"""
+    facts = frozenset(facts)
+    # the lock is held until the Prolog store is updated, and the mirror only records the facts it holds
+    # then, so a concurrent query of the session never finds no difference while the store is behind
+    with _sessions_lock:
+        stored = _sessions.pop(session, frozenset())
+        added, removed = facts - stored, stored - facts
+        evicted = []
+        try:
+            if added or removed:
+                _solve(
+                    f"update_session_facts({_atom(session)}, [{', '.join(added)}], [{', '.join(removed)}])"
+                )
+            _sessions[session] = facts
+            while len(_sessions) > SESSION_LIMIT:
+                evicted.append(_sessions.popitem(last=False)[0])
+        except Exception:
+            # the store is rebuilt from scratch on the next turn
+            evicted.append(session)
+            raise
+        finally:
+            for item in evicted:
+                _solve(f"drop_session({_atom(item)})")
+
+
+def _render(term):
+    if isinstance(term, pyswip.Atom):
+        return term.value
+    if isinstance(term, pyswip.Functor):
+        name = term.name.value
+        return f"{name}({', '.join(_render(x) for x in term.args)})" if term.args else name
+    if isinstance(term, pyswip.Variable):
+        return "_"
+    if isinstance(term, list):
+        return f"[{', '.join(_render(x) for x in term)}]"
+    if isinstance(term, bytes):
+        return term.decode()
+    return str(term)
+
+
+def _explanation_tree(expl):
+    """Converts an explanation built by solve/2, as returned by _solve_bindings or the worker processes, into
+    nested tuples of strings, leaving out the bookkeeping nodes"""
+    return tuple(
+        _explanation_tree(x) if isinstance(x, list) else _render(x)
+        for x in expl
+        if not (
+            isinstance(x, str)
+            and (x == "system_predicate" or x.startswith(("auxiliary_right_scope(", "right_property_scope(")))
+        )
+    )
 
 
 def _solve(query):
     return list(_swipl.query(query))
 
 
-def _with_explanation(module, query, explanation=True):
-    return f"{module}:explain({query}, Expl)" if explanation else f"{module}:{query}"
+def _data(term):
+    """A pyswip term as the worker processes return it: lists stay lists, numbers stay numbers and other
+    terms are rendered"""
+    if isinstance(term, list):
+        return [_data(x) for x in term]
+    if isinstance(term, (int, float)):
+        return term
+    return _render(term)
+
+
+def _solve_bindings(query):
+    """Returns the bindings of the first solution, copied out of the term handles before the query is closed"""
+    with closing(_swipl.query(query, normalize=False)) as solutions:
+        for solution in solutions:
+            return {x.args[0].value: _data(x.args[1]) for x in solution}
+    return None
+
+
+def limit_counters():
+    """Number of targets cut short by each query limit since startup"""
+    with _limits_lock:
+        return dict(_limits)
+
+
+def _run_goal(goal, targets):
+    """Bindings of the first solution of goal, with the target modules loaded"""
+    if _workers is not None:
+        # the workers have all the modules loaded, and return terms already rendered
+        return _workers.run(goal) or {}
+    with ExitStack() as stack:
+        for law, module in targets:
+            stack.enter_context(_registry.using(law, module))
+        return _solve_bindings(goal) or {}
+
+
+def _indicator(fact):
+    """Name/Arity of a fact"""
+    name, _, args = fact.partition("(")
+    if not args:
+        return f"{name.strip()}/0"
+    arity, depth, quote = 1, 0, None
+    for c in args[: args.rindex(")")]:
+        if quote:
+            quote = None if c == quote else quote
+        elif c in "'\"":
+            quote = c
+        elif c in "([{":
+            depth += 1
+        elif c in ")]}":
+            depth -= 1
+        elif c == "," and not depth:
+            arity += 1
+    return f"{name.strip()}/{arity}"
+
+
+def _right_requirements(law, module):
+    """Right in the head, and predicates needing facts, of each has_right/4 clause of a module"""
+    with _requirements_lock:
+        requirements = _requirements.get((law, module))
+    if requirements is None:
+        bindings = _run_goal(f"right_requirements({module}, Requirements)", [(law, module)])
+        requirements = [
+            (_render(right), frozenset(_render(x) for x in predicates))
+            for right, predicates in bindings.get("Requirements", [])
+        ]
+        with _requirements_lock:
+            _requirements[(law, module)] = requirements
+    return requirements
+
+
+def _right_dependencies(law, module):
+    """Predicates the gate of a module depends on, and right in the head and predicates each has_right/4 clause depends on"""
+    with _requirements_lock:
+        dependencies = _dependencies.get((law, module))
+    if dependencies is None:
+        bindings = _run_goal(f"right_dependencies({module}, Gate, Dependencies)", [(law, module)])
+        dependencies = (
+            frozenset(_render(x) for x in bindings.get("Gate", [])),
+            [
+                (_render(right), frozenset(_render(x) for x in predicates))
+                for right, predicates in bindings.get("Dependencies", [])
+            ],
+        )
+        with _requirements_lock:
+            _dependencies[(law, module)] = dependencies
+    return dependencies
+
+
+def _affected_rights(laws, modules, changed):
+    """Rights of the target modules whose answers may change with facts of the changed Name/Arity, None if any may"""
+    affected = set()
+    for law, module in _targets(laws, modules):
+        gate, clauses = _right_dependencies(law, module)
+        if "*" in gate or gate & changed:
+            return None
+        for head, predicates in clauses:
+            if "*" in predicates or predicates & changed:
+                if head == "_":
+                    return None
+                affected.add(head)
+    return affected
+
+
+def _may_hold(law, module, right, present):
+    """Whether a has_right/4 clause of the module, for right, has facts for all the predicates it needs"""
+    return any(
+        (right == "Right" or head in ("_", right)) and predicates <= present
+        for head, predicates in _right_requirements(law, module)
+    )
+
+
+def _batch_goal(person, facts, targets, right, opt, explanation, session, abduce=False, rights=None):
+    options = [f"rights([{', '.join(rights)}])"] if rights is not None else []
+    if abduce:
+        options.append(f"abduce({ABDUCTION_LITERALS}, [{', '.join(ABDUCIBLES)}], {ABDUCTION_TIME})")
+    inferences = [x for x in (INFERENCE_LIMIT, ABDUCTION_INFERENCES if abduce else 0) if x]
+    if inferences:
+        options.append(f"inferences({min(inferences)})")
+    if TIME_LIMIT:
+        options.append(f"time_limit({TIME_LIMIT})")
+    return (
+        f"batch_has_right({'none' if session is None else _atom(session)}, "
+        f"[{', '.join(f'{law}-{module}' for law, module in targets)}], "
+        f"[{', '.join(facts)}], {'true' if explanation else 'false'}, "
+        f"{right}, {person}, {opt}, [{', '.join(options)}], Rows, Incomplete)"
+    )
+
+
+def _abduced(tree):
+    """Goals abduced in an explanation tree"""
+    return frozenset(
+        y
+        for x in tree
+        for y in (_abduced(x) if isinstance(x, tuple) else [x] if x.startswith("abduced(") else [])
+    )
+
+
+def _minimal(rights):
+    """Keeps, for each right, the explanations whose abduced goals are not a strict superset of those of another one"""
+    abduced = {x: _abduced(x[5]) for x in rights}
+    return set(
+        x
+        for x in rights
+        if not any(y[:5] == x[:5] and abduced[y] < abduced[x] for y in rights)
+    )
+
+
+def _targets(laws, modules):
+    modules = [m if l == "dir" else f"{m}_{l}" for m in modules for l in laws]
+    return [
+        (law, module)
+        for law, module in _registry.mappings()
+        if law in laws and module in modules
+    ]
 
 
 def right_to(
@@ -145,81 +544,91 @@ def right_to(
     right,
     opt,
     explanation,
+    session=None,
+    abduce=False,
+    present=None,
+    rights=None,
 ):
-    modules = [m if l == "dir" else f"{m}_{l}" for m in modules for l in laws]
-    return set(
+    """Returns the rights found in the target modules, and the (law, module, reason) of the targets cut short by a query limit.
+    When present, the Name/Arity of the case facts, the modules with no right that can hold on them are skipped.
+    When rights is given, only those rights are searched"""
+    targets = _targets(laws, modules)
+    if present is not None:
+        targets = [(law, module) for law, module in targets if _may_hold(law, module, right, present)]
+    if not targets:
+        return set(), []
+
+    bindings = _run_goal(_batch_goal(person, facts, targets, right, opt, explanation, session, abduce, rights), targets)
+    rows = bindings.get("Rows", [])
+
+    incomplete = [
+        (_render(law), _render(module), _render(reason))
+        for law, module, reason in bindings.get("Incomplete", [])
+    ]
+    if incomplete:
+        with _limits_lock:
+            _limits.update(reason for _, _, reason in incomplete)
+
+    rights = set(
         (
-            law,
-            module,
-            x["Art"],
-            x["Opt"] if opt == "Opt" else opt,
-            x["Right"] if right == "Right" else right,
-            _json_clean_explanation(x["Expl"]) if explanation else "",
-        )
-        for law, module in _mappings
-        if law in laws and module in modules
-        for x in _with_facts(
-            lambda: _solve(
-                _with_explanation(
-                    module,
-                    f"has_right({right}, {law}, Art, {person}, {opt})",
-                    explanation,
-                )
-            ),
-            facts,
-            module
+            _render(law),
+            _render(module),
+            _render(art),
+            _render(x_opt) if opt == "Opt" else opt,
+            _render(x_right) if right == "Right" else right,
+            _explanation_tree(expl) if explanation else "",
         )
+        for law, module, art, x_opt, x_right, expl in rows
+    )
+    return (_minimal(rights) if abduce and explanation else rights), incomplete
+
+def generate_response(personId, facts, laws, modules, right="Right", opt="Opt", abduce=False, session=None, explanation=True, rights=None):
+    if _workers is not None:
+        # the worker processes keep no session facts, each query carries the whole case
+        session = None
+    if session is not None:
+        _sync_session(session, facts)
+    rights, incomplete = right_to(
+        personId,
+        facts if session is None else [],
+        laws=laws,
+        modules=modules,
+        right=right,
+        opt=opt,
+        explanation=explanation,
+        session=session,
+        abduce=abduce,
+        # abduction may supply the facts a rule is missing
+        present=frozenset(_indicator(x) for x in facts) if PRUNING and not abduce else None,
+        rights=rights,
     )
-
-def generate_response(personId, facts, laws, modules, right="Right", opt="Opt", abduce=False):
     return [
         {
             "right": item[4],
             "law": item[1],
             "article": item[2],
             "option": item[3],
-            "explanation": item[5] if not item[5] else json.loads(item[5])
+            "explanation": item[5]
         }
-        for item in right_to(
-            personId,
-            facts + (["abd_enabled"] if abduce else []),
-            laws=laws,
-            modules=modules,
-            right=right,
-            opt=opt,
-            explanation=True,
-        )
+        for item in rights
+    ], [
+        {"law": law, "module": module, "reason": reason}
+        for law, module, reason in incomplete
     ]
 
 def prettify_response(response, facts):
 
     def _get_article_text(type, law, article):
-        directive = law[:-3] if not law[-1].isdigit() else law
-        path = source_path(directive, nationality(law))
-        with open(path, "r") as pl_src:
-            law_text = pl_src.read()
-            res = re.search(
-                type
-                + r"\(_"
-                + article
-                + ".+\n%\n%\s?([^%]+?(?=%))([\S\s%\n]+?)(?=\n[a-z]|\$)(\$[\s\S]*?\$)?",
-                law_text,
-            )
-            if res is not None:
-                title = res.group(1).replace("%", "")
-                text = res.group(2).replace("%", " ")
-                comment = (res.group(3) or "").replace("%", " ").replace("$", "")
-                return [title, text, comment]
-        return ""
+        return article_text(type, law, article)
 
     def _to_html_tree(tree, facts):
         if tree == "":
             return ""
         log = "<ul>"
         for x in tree:
-            if isinstance(x, list) and not x:
+            if isinstance(x, tuple) and not x:
                 continue
-            if isinstance(x, list):
+            if isinstance(x, tuple):
                 log += _to_html_tree(x, facts)
             elif x.startswith(":(user"):
                 log += (
@@ -245,9 +654,9 @@ def prettify_response(response, facts):
             return []
         temp = []
         for x in explanation:
-            if isinstance(x, list) and not x:
+            if isinstance(x, tuple) and not x:
                 continue
-            if isinstance(x, list):
+            if isinstance(x, tuple):
                 temp += _extract_facts(x)
             elif x in facts:
                 temp += [x]
@@ -258,9 +667,9 @@ def prettify_response(response, facts):
             return []
         temp = []
         for x in explanation:
-            if isinstance(x, list) and not x:
+            if isinstance(x, tuple) and not x:
                 continue
-            if isinstance(x, list):
+            if isinstance(x, tuple):
                 temp += _extract_abduced_facts(x)
             elif x.startswith("abduced"):
                 temp += [re.search(r"abduced\((.+)\)", x).group(1)]
@@ -277,15 +686,11 @@ def prettify_response(response, facts):
 
         modifier = lambda x : "-" if x ==  "directive" else "="
 
-        import random
-
         for law, rights in elem.items():
             for y in rights:
-              y[
-                  "arg_rule"
-              ] = f"f{random.randint(1, 10000)} :{modifier(law)}> right({law}, {y['article']}, {y['right']}, {y['option']}, {sorted(set(y['facts'] + y['abduced']))}).".replace(
-                  "'", ""
-              )
+              rule = f"right({law}, {y['article']}, {y['right']}, {y['option']}, {sorted(set(y['facts'] + y['abduced']))})".replace("'", "")
+              # ids come from the rule, so the same rights always make the same theory
+              y["arg_rule"] = f"f{digest(rule)[:16]} :{modifier(law)}> {rule}."
 
         return elem
 
@@ -307,11 +712,123 @@ def prettify_response(response, facts):
 
     return group
 
-def query(personId, facts, laws, modules, right="Right", opt="Opt", abduce=False):
+def _case(personId, facts):
     f = facts + [f"person_made_aware({personId}, personStatus)", f"proceeding_status({personId}, started)", f"proceeding_type({personId}, criminal)"]
-    f = list(set([x.replace(".", "").strip() for x in f]))
-    response = generate_response(personId, f, laws, modules, right=right, opt=opt, abduce=abduce)
-    return prettify_response(response, f)
+    # cases are queried and cached with a placeholder in place of the person id
+    return canonical_case(personId, [x.replace(".", "") for x in f])
+
+def evaluate(personId, facts, laws, modules, right="Right", opt="Opt", abduce=False, session=None, explanation=True, affinity=None):
+    """As query, returning {"rights": <query result>, "incomplete": [{"law", "module", "reason"}]}, the
+    targets listed in incomplete having been cut short by the inference, time or stack limits.
+    The query runs on the engine picked by affinity, or by session when no affinity is given"""
+    person, f = _case(personId, facts)
+
+    # results are shared by all sessions, callers get their own renamed copy
+    bounds = (ABDUCTION_LITERALS, ABDUCTION_INFERENCES, ABDUCTION_TIME) if abduce else None
+    limits = (INFERENCE_LIMIT, TIME_LIMIT, STACK_LIMIT)
+    key = digest(person, f, sorted(laws), sorted(modules), right, opt, abduce, bounds, limits, explanation)
+    cached = _results.get(key)
+    if cached is not None:
+        return rename(cached, personId)
+
+    affinity = session if affinity is None else affinity
+    # the last result of the same query in the session, which a new turn usually changes by a few facts
+    signature = (session, digest(sorted(laws), sorted(modules), right, opt, explanation))
+    previous = _previous.get(signature) if session is not None and not abduce else None
+
+    store = get_store()
+    result = store.get("query", key) if store is not None else None
+    if result is None:
+        if previous is not None:
+            result = _update(previous, person, f, laws, modules, right, opt, explanation, session, affinity)
+        if result is None:
+            response, incomplete = _call(generate_response, person, f, laws, modules, right=right, opt=opt, abduce=abduce, session=session, explanation=explanation, affinity=affinity)
+            result = {"rights": prettify_response(response, f), "incomplete": incomplete}
+        if store is not None and not _timed_out(result):
+            store.put("query", key, result)
+    if not _timed_out(result):
+        _results.put(key, result)
+    if session is not None and not abduce:
+        _previous.put(signature, (f, result))
+    return rename(result, personId)
+
+def _timed_out(result):
+    """Whether a target of result was cut short by the time limit, which depends on the load of the machine.
+    The inference and stack limits cut a query at the same point every time, and are part of its key"""
+    return any(x["reason"] == "time_limit" for x in result["incomplete"])
+
+def _call(execute, *args, affinity=None, **kwargs):
+    # the worker processes do not need a Prolog engine in this process
+    if _workers is not None:
+        return execute(*args, **kwargs)
+    return _pool.run(execute, *args, affinity=affinity, **kwargs)
+
+def _update(previous, person, facts, laws, modules, right, opt, explanation, session, affinity):
+    """Result for facts made from the previous one, searching again only the rights that depend on the
+    predicates of the facts added or removed since. None when it cannot be told which rights those are"""
+    before_facts, before = previous
+    if before["incomplete"]:
+        return None
+    changed = frozenset(_indicator(x) for x in set(before_facts) ^ set(facts))
+    affected = _call(_affected_rights, laws, modules, changed, affinity=affinity)
+    if affected is None:
+        return None
+    searched = affected if right == "Right" else affected & {right}
+    rights = {name: value for name, value in before["rights"].items() if name not in searched}
+    incomplete = []
+    if searched:
+        response, incomplete = _call(
+            generate_response, person, facts, laws, modules, right=right, opt=opt, session=session, explanation=explanation,
+            rights=sorted(searched) if right == "Right" else None, affinity=affinity,
+        )
+        rights.update(prettify_response(response, facts))
+    return {"rights": rights, "incomplete": incomplete}
+
+def query(personId, facts, laws, modules, right="Right", opt="Opt", abduce=False, session=None, explanation=True):
+    return evaluate(personId, facts, laws, modules, right=right, opt=opt, abduce=abduce, session=session, explanation=explanation)["rights"]
+
+def directives():
+    """The directives enabled in the manifest"""
+    return [directive for directive, entry in _manifest.items() if entry["enabled"]]
+
+def _gates(person, facts, modules):
+    targets = [("dir", m) for m in modules if ("dir", m) in _registry.mappings()]
+    if not targets:
+        return {}
+    bindings = _run_goal(
+        f"directives_apply([{', '.join(m for _, m in targets)}], [{', '.join(facts)}], {person}, Outcomes)",
+        targets,
+    )
+    return {_render(module): _render(applies) == "true" for module, applies in bindings.get("Outcomes", [])}
+
+def applicable(personId, facts, modules=None):
+    """Whether each directive (by default, each enabled one) applies to the case according to its
+    applicability gate alone, as {directive: bool}"""
+    modules = directives() if modules is None else list(modules)
+    person, f = _case(personId, facts)
+    key = digest("applies", person, f, sorted(modules))
+    gates = _results.get(key)
+    if gates is None:
+        gates = _call(_gates, person, f, modules)
+        _results.put(key, gates)
+    return dict(gates)
+
+def discover(personId, facts, laws=("dir",), modules=None, right="Right", opt="Opt", session=None, explanation=False):
+    """Evaluates the case in all the enabled directives (or in modules) at once, each one on its own engine
+    when the pool has enough of them, returning {directive: evaluate result}"""
+    modules = directives() if modules is None else modules
+    if session is not None and _workers is None:
+        # the directives share the session facts, which are brought up to date only once
+        _pool.run(_sync_session, session, _case(personId, facts)[1], affinity=session)
+    with ThreadPoolExecutor(max_workers=max(1, len(modules))) as executor:
+        results = {
+            directive: executor.submit(
+                evaluate, personId, facts, list(laws), [directive], right=right, opt=opt,
+                session=session, explanation=explanation, affinity=i,
+            )
+            for i, directive in enumerate(modules)
+        }
+        return {directive: result.result() for directive, result in results.items()}
 
 if __name__ == "__main__":
 
@@ -341,7 +858,8 @@ if __name__ == "__main__":
         return ['proceeding_type(alessandro, criminal)', 'person_status(alessandro, suspect)', 'person_made_aware(alessandro, personStatus)', 'person_status(alessandro, deprived_of_liberty)', "proceeding_country(alessandro, 'netherlands')", "person_nationality(alessandro, 'italy')", 'person_nominate(alessandro, giulio)']
 
     #facts, response = generate_response("personId", tt(), ["dir", "it"], right="right_to_appear", abduce=True)
-    facts, response = generate_response("alessandro", n(), ["dir"], ["directive_2013_48"])
+    response, incomplete = generate_response("alessandro", n(), ["dir"], ["directive_2013_48"])
+    facts = n()
     pretty = prettify_response(response, facts)
 
     for k, i in pretty.items():
@@ -0,0 +1,106 @@
+import os
+import json
+import itertools
+import threading
+import subprocess
+
+root = os.path.abspath(os.path.dirname(__file__))
+
+SWIPL = os.environ.get("CROSSJUSTICE_SWIPL", "swipl")
+
+
+class WorkerError(Exception):
+    """Raised when a worker process reports an error or dies while running a goal"""
+
+
+class _Worker:
+    """A swipl process running prolog/worker.pl, answering one goal at a time"""
+
+    def __init__(self, setup):
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._setup = setup
+        self._start()
+
+    def _start(self):
+        self._process = subprocess.Popen(
+            [SWIPL, os.path.join(root, "prolog/worker.pl")],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        print("{INFO} started prolog worker: %d" % self._process.pid)
+        for goal in self._setup:
+            self._call(goal)
+
+    def _call(self, goal):
+        self._process.stdin.write(json.dumps({"goal": goal}) + "\n")
+        self._process.stdin.flush()
+        line = self._process.stdout.readline()
+        if not line:
+            self._process.wait()
+            raise WorkerError("prolog worker %d exited" % self._process.pid)
+        reply = json.loads(line)
+        if reply["status"] == "error":
+            raise WorkerError(reply["message"])
+        return reply["bindings"] if reply["status"] is True else None
+
+    def run(self, goal):
+        with self._lock:
+            try:
+                return self._call(goal)
+            except OSError as e:
+                # the pipes broke with the process, the next goal runs on a fresh one
+                pid = self._process.pid
+                self._process.wait()
+                self._start()
+                raise WorkerError("prolog worker %d exited" % pid) from e
+            except WorkerError:
+                if self._process.poll() is None:
+                    raise
+                self._start()
+                raise
+
+    def close(self):
+        with self._lock:
+            self._process.stdin.close()
+            self._process.wait()
+
+
+class WorkerPool:
+    """Fixed set of swipl worker processes, each goal running on the one with the fewest pending goals"""
+
+    def __init__(self, size, setup=()):
+        self._setup = list(setup)
+        self._workers = [_Worker(self._setup) for _ in range(max(1, size))]
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        with self._lock:
+            # ties go round robin, so that idle workers take turns
+            start = next(self._next) % len(self._workers)
+            order = self._workers[start:] + self._workers[:start]
+            worker = min(order, key=lambda x: x.pending)
+            worker.pending += 1
+            return worker
+
+    def run(self, goal):
+        """Bindings of the first solution of goal, as JSON values, or None if it fails"""
+        worker = self._acquire()
+        try:
+            return worker.run(goal)
+        finally:
+            with self._lock:
+                worker.pending -= 1
+
+    def broadcast(self, goal):
+        """Runs goal on every worker, and on the workers started later to replace them"""
+        self._setup.append(goal)
+        for worker in self._workers:
+            worker.run(goal)
+
+    def close(self):
+        for worker in self._workers:
+            worker.close()
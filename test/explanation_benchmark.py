@@ -0,0 +1,78 @@
+import os
+import re
+import sys
+import json
+import time
+from pathlib import Path
+from contextlib import ExitStack
+
+sys.path.append(os.path.join(Path(__file__).parent.absolute(), "..", "src"))
+
+import swi_interface
+
+
+def parse_file(file_path, file_name):
+  directive, law, person_id = file_name.replace(".txt", "").split("@")[:3]
+
+  with open(os.path.join(file_path, file_name), "r") as f:
+    text = f.read()
+
+  facts_match = re.search(r"FACTS\n(.*?)\nFACTS_END", text, re.DOTALL)
+  facts = [line.strip().replace(".", "") for line in facts_match.group(1).split("\n") if line.strip()] if facts_match else []
+
+  return directive, law, person_id, facts
+
+
+def legacy_explanation(expl):
+  # the stringify, regex and JSON round trip that preceded _explanation_tree
+  def _clean_explanation(tmp_list):
+    log = []
+    for tmp in tmp_list:
+      if isinstance(tmp, list):
+        log.append(_clean_explanation(tmp))
+      else:
+        tmp = re.sub(r"Variable\(\d+\)", "_", str(tmp))
+        if (
+          tmp != "system_predicate"
+          and not tmp.startswith("auxiliary_right_scope")
+          and not tmp.startswith("right_property_scope")
+        ):
+          log.append(tmp)
+    return log
+
+  return json.loads(json.dumps(_clean_explanation(expl)))
+
+
+def legacy_path(goal):
+  rows = list(swi_interface._swipl.query(goal))
+  return [legacy_explanation(row[5]) for row in (rows[0]["Rows"] if rows else [])]
+
+
+def direct_path(goal):
+  rows = (swi_interface._solve_bindings(goal) or {}).get("Rows", [])
+  return [swi_interface._explanation_tree(row[5]) for row in rows]
+
+
+def compare(repeat=5):
+  path = os.path.join(Path(__file__).parent.absolute(), "..", "res", "extraction")
+  cases = [parse_file(path, f) for f in sorted(os.listdir(path))]
+
+  with ExitStack() as stack:
+    goals = []
+    for directive, law, person_id, facts in cases:
+      targets = [(l, m) for l, m in swi_interface._registry.mappings() if m in (directive, f"{directive}_{law}")]
+      for l, m in targets:
+        stack.enter_context(swi_interface._registry.using(l, m))
+      goals.append(swi_interface._batch_goal(person_id, facts, targets, "Right", "Opt", True, None))
+
+    for name, convert in [("legacy", legacy_path), ("direct", direct_path)]:
+      start = time.perf_counter()
+      for _ in range(repeat):
+        for goal in goals:
+          convert(goal)
+      mean = (time.perf_counter() - start) / (repeat * len(goals))
+      print(f"{name}: {mean * 1000:.2f} ms per case")
+
+
+if __name__ == "__main__":
+  compare()
@@ -0,0 +1,51 @@
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(os.path.join(Path(__file__).parent.absolute(), "..", "src"))
+
+import swi_interface
+
+
+def parse_file(file_path, file_name):
+  directive, law, person_id = file_name.replace(".txt", "").split("@")[:3]
+
+  with open(os.path.join(file_path, file_name), "r") as f:
+    text = f.read()
+
+  facts_match = re.search(r"FACTS\n(.*?)\nFACTS_END", text, re.DOTALL)
+  facts = [line.strip().replace(".", "") for line in facts_match.group(1).split("\n") if line.strip()] if facts_match else []
+
+  return directive, law, person_id, facts
+
+
+def time_cases(cases, explanation, repeat):
+  start = time.perf_counter()
+  for _ in range(repeat):
+    for directive, law, person_id, facts in cases:
+      swi_interface.right_to(person_id, facts, ["dir", law], [directive], "Right", "Opt", explanation)
+  return (time.perf_counter() - start) / (repeat * len(cases))
+
+
+def compare(repeat=3):
+  path = os.path.join(Path(__file__).parent.absolute(), "..", "res", "extraction")
+  cases = [parse_file(path, f) for f in sorted(os.listdir(path))]
+
+  # load every module first, so that loading time is not measured
+  time_cases(cases, False, 1)
+
+  # queries with explanations go through the meta-interpreter, which reads the clauses with clause/2 and
+  # never calls the tabled predicates: their times should not change with tabling, and only show the noise
+  for explanation in [False, True]:
+    for tabling in [False, True]:
+      swi_interface.set_tabling(tabling)
+      mean = time_cases(cases, explanation, repeat)
+      print(f"explanation={explanation} tabling={tabling}: {mean * 1000:.2f} ms per case")
+
+  swi_interface.set_tabling(swi_interface.TABLING)
+
+
+if __name__ == "__main__":
+  compare()
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(os.path.join(Path(__file__).parent.absolute(), "..", "src"))
+
+from cache import LRUCache, digest
+
+
+def test_digest_is_stable_and_order_sensitive():
+    assert digest("a", [1, 2], {"x": 1, "y": 2}) == digest("a", [1, 2], {"y": 2, "x": 1})
+    assert digest("a", [1, 2]) != digest("a", [2, 1])
+    assert digest("a", "b") != digest("ab")
+
+
+def test_digest_sorts_sets():
+    assert digest({"b", "a", "c"}) == digest({"c", "b", "a"}) == digest(["a", "b", "c"])
+
+
+def test_get_and_default():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("b", 0) == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_put_refreshes_an_entry():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("a", 10)
+    cache.put("c", 3)
+    assert cache.get("a") == 10
+    assert cache.get("b") is None
+
+
+def test_entries_expire_after_ttl():
+    cache = LRUCache(2, ttl=0.05)
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.1)
+    assert cache.get("a") is None
+
+
+def test_zero_size_keeps_nothing():
+    cache = LRUCache(0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_clear():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.clear()
+    assert cache.get("a") is None
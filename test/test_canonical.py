@@ -0,0 +1,40 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(os.path.join(Path(__file__).parent.absolute(), "..", "src"))
+
+from canonical import PERSON, normalize, canonical_case, rename
+
+
+def test_whitespace_and_period():
+    assert normalize("  proceeding_language( nino ,polish ). ") == "proceeding_language(nino, polish)"
+
+
+def test_quoted_atoms():
+    assert normalize("nationality(nino, 'Polish')") == "nationality(nino, polish)"
+    assert normalize("location(nino, 'New York')") == "location(nino, 'new york')"
+
+
+def test_quoted_text_keeps_its_spaces():
+    assert normalize('note(nino, "a  b")') == 'note(nino, "a  b")'
+
+
+def test_person_is_renamed_as_a_whole_token():
+    assert normalize("person_status(nino, suspect)", "nino") == f"person_status({PERSON}, suspect)"
+    assert normalize("parent(nino_sr, nino)", "nino") == f"parent(nino_sr, {PERSON})"
+
+
+def test_cases_differing_in_the_person_only_are_the_same():
+    a = canonical_case("nino", ["person_status(nino, suspect)", "proceeding_language(nino, polish)."])
+    b = canonical_case("anna", ["proceeding_language( anna, polish)", "person_status(anna,suspect)"])
+    assert a == b == (PERSON, [f"person_status({PERSON}, suspect)", f"proceeding_language({PERSON}, polish)"])
+
+
+def test_duplicate_and_empty_facts_are_dropped():
+    assert canonical_case("nino", ["a(nino)", "a( nino )", " "]) == (PERSON, [f"a({PERSON})"])
+
+
+def test_rename_nested_results():
+    result = {"right": [f"has_right({PERSON}, x)", (f"{PERSON}_sr", 1)], "facts": {f"a({PERSON})"}}
+    assert rename(result, "nino") == {"right": ["has_right(nino, x)", (f"{PERSON}_sr", 1)], "facts": {"a(nino)"}}
@@ -0,0 +1,45 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(os.path.join(Path(__file__).parent.absolute(), "..", "src"))
+
+from argumentation.arg_interface import conformity
+
+DIRECTIVE = "f1 :-> right(directive, art2_7, right_to_interpretation, europeanArrestWarrant, [proceeding_language(nino, polish), proceeding_type(nino, europeanArrestWarrant)])."
+SAME = "f2 :=> right(pl, article607l_4, right_to_interpretation, europeanArrestWarrant, [proceeding_language(nino, polish), proceeding_type(nino, europeanArrestWarrant)])."
+DIFFERENT = "f3 :=> right(it, article143_1, right_to_interpretation, europeanArrestWarrant, [proceeding_language(nino, polish)])."
+OTHER_OPTION = "f4 :-> right(directive, art2_7, right_to_interpretation, trial, [proceeding_type(nino, criminal)])."
+
+KEY = ("right_to_interpretation", "europeanArrestWarrant", "art2_7")
+
+
+def test_levels_of_every_country():
+    result = conformity("\n".join([DIRECTIVE, SAME, DIFFERENT]), ["pl", "it", "nl"])
+    assert result == {
+        KEY + ("pl",): "full",
+        # partialConformity and -conformity are both IN, the partial one is reported
+        KEY + ("it",): "partial",
+        KEY + ("nl",): "none",
+    }
+
+
+def test_full_conformity_outranks_partial_conformity():
+    partial = DIFFERENT.replace("right(it,", "right(pl,")
+    assert conformity("\n".join([DIRECTIVE, SAME, partial]), ["pl"]) == {KEY + ("pl",): "full"}
+
+
+def test_options_of_an_article_are_evaluated_separately():
+    result = conformity("\n".join([DIRECTIVE, SAME, OTHER_OPTION]), ["pl"])
+    assert result == {
+        KEY + ("pl",): "full",
+        ("right_to_interpretation", "trial", "art2_7", "pl"): "none",
+    }
+
+
+def test_no_directive_rights():
+    assert conformity(SAME, ["pl"]) == {}
+
+
+def test_unparsable_theory():
+    assert conformity("f1 :-> right(directive, art2_7", ["pl"]) == {}
@@ -0,0 +1,95 @@
+import os
+import sys
+import shutil
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.join(Path(__file__).parent.absolute(), "..", "src"))
+
+from argumentation import grounded
+from argumentation.arg_interface import reasoner, get_full_theory, _run_once
+
+DIRECTIVE = "f1 :-> right(directive, art2_7, right_to_interpretation, europeanArrestWarrant, [proceeding_language(nino, polish), proceeding_type(nino, europeanArrestWarrant)])."
+SAME = "f2 :=> right(pl, article607l_4, right_to_interpretation, europeanArrestWarrant, [proceeding_language(nino, polish), proceeding_type(nino, europeanArrestWarrant)])."
+DIFFERENT = "f3 :=> right(pl, article72_1, right_to_interpretation, europeanArrestWarrant, [proceeding_language(nino, polish)])."
+
+THEORIES = {
+    "full": [DIRECTIVE, SAME],
+    "partial": [DIRECTIVE, DIFFERENT],
+    "missing": [DIRECTIVE],
+}
+
+
+def labels(rules, laws=("pl",)):
+    """{conclusion: set of the labels of its arguments}"""
+    result = {}
+    for label, arguments in grounded.solve(get_full_theory("\n".join(rules), list(laws))).items():
+        for argument in arguments:
+            result.setdefault(grounded.render(argument.conclusion), set()).add(label)
+    return result
+
+
+def test_full_conformity():
+    result = labels(THEORIES["full"])
+    assert result["conformity(pl, art2_7)"] == {"IN"}
+    assert result["'-'(conformity(pl, art2_7))"] == {"OUT"}
+    assert "partialConformity(pl, art2_7)" not in result
+
+
+def test_partial_conformity():
+    result = labels(THEORIES["partial"])
+    assert result["partialConformity(pl, art2_7)"] == {"IN"}
+    # no national right has the same conditions
+    assert result["'-'(conformity(pl, art2_7))"] == {"IN"}
+    assert "conformity(pl, art2_7)" not in result
+
+
+def test_missing_national_provision():
+    result = labels(THEORIES["missing"])
+    assert result["'-'(conformity(pl, art2_7))"] == {"IN"}
+    assert "conformity(pl, art2_7)" not in result
+    assert "partialConformity(pl, art2_7)" not in result
+
+
+def test_full_conformity_defeats_partial_conformity():
+    result = labels([DIRECTIVE, SAME, DIFFERENT])
+    assert result["conformity(pl, art2_7)"] == {"IN"}
+    assert result["partialConformity(pl, art2_7)"] == {"OUT"}
+    assert result["'-'(conformity(pl, art2_7))"] == {"OUT"}
+
+
+def test_countries_are_evaluated_separately():
+    result = labels(THEORIES["full"], laws=("pl", "it"))
+    assert result["conformity(pl, art2_7)"] == {"IN"}
+    assert result["'-'(conformity(it, art2_7))"] == {"IN"}
+
+
+def test_mutual_rebuttal_is_undecided():
+    result = labels(["a :=> p.", "b :=> -p."])
+    assert result["p"] == {"UND"}
+    assert result["'-'(p)"] == {"UND"}
+
+
+def test_report_lists_arguments_under_their_label():
+    report = grounded.run(get_full_theory("\n".join(THEORIES["full"]), ["pl"]))
+    sections = dict(section.split(":\n", 1) for section in report.split("\n\n") if section)
+    assert "conformity(pl, art2_7) [r1, f1, f2]" in sections["IN"]
+    assert "'-'(conformity(pl, art2_7)) [r3, f1]" in sections["OUT"]
+    assert sections["UND"].strip() == ""
+
+
+def test_unsupported_input_raises_value_error():
+    with pytest.raises(ValueError):
+        grounded.solve("f1 :-> right(directive, art2_7")
+    with pytest.raises(ValueError):
+        grounded.solve("r1 : p, prolog(write(x)) -> q. f1 :-> p.")
+
+
+@pytest.mark.skipif(shutil.which("java") is None or not os.path.exists(reasoner), reason="needs java and the arg2p jar")
+@pytest.mark.parametrize("case", sorted(THEORIES))
+def test_same_conclusions_as_the_jar(case):
+    theory = get_full_theory("\n".join(THEORIES[case]), ["pl"])
+    printed = _run_once(theory)
+    for argument in grounded.solve(theory)["IN"]:
+        assert grounded.render(argument.conclusion) in printed
@@ -0,0 +1,60 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(os.path.join(Path(__file__).parent.absolute(), "..", "src"))
+
+import result_store
+from result_store import ResultStore, kb_version
+
+
+def test_put_and_get(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"), "v1")
+    store.put("query", "k", {"rights": {"a": [1, 2]}, "incomplete": []})
+    assert store.get("query", "k") == {"rights": {"a": [1, 2]}, "incomplete": []}
+    assert store.get("query", "other") is None
+
+
+def test_kinds_are_separate(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"), "v1")
+    store.put("query", "k", 1)
+    store.put("pretty", "k", "summary")
+    assert store.get("query", "k") == 1
+    assert store.get("pretty", "k") == "summary"
+
+
+def test_put_replaces(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"), "v1")
+    store.put("query", "k", 1)
+    store.put("query", "k", 2)
+    assert store.get("query", "k") == 2
+
+
+def test_results_persist_across_stores(tmp_path):
+    ResultStore(str(tmp_path / "results.db"), "v1").put("query", "k", 1)
+    assert ResultStore(str(tmp_path / "results.db"), "v1").get("query", "k") == 1
+
+
+def test_other_versions_are_dropped(tmp_path):
+    ResultStore(str(tmp_path / "results.db"), "v1").put("query", "k", 1)
+    store = ResultStore(str(tmp_path / "results.db"), "v2")
+    assert store.get("query", "k") is None
+    assert ResultStore(str(tmp_path / "results.db"), "v1").get("query", "k") is None
+
+
+def test_kb_version_follows_the_prolog_sources(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_store, "root", str(tmp_path))
+    (tmp_path / "prolog").mkdir()
+    (tmp_path / "prolog" / "a.pl").write_text("a.")
+    (tmp_path / "prolog" / "notes.txt").write_text("ignored")
+    version = kb_version()
+    assert kb_version() == version
+    (tmp_path / "prolog" / "notes.txt").write_text("still ignored")
+    assert kb_version() == version
+    (tmp_path / "prolog" / "a.pl").write_text("b.")
+    assert kb_version() != version
+
+
+def test_no_store_without_a_path(monkeypatch):
+    monkeypatch.setattr(result_store, "RESULT_STORE", "")
+    assert result_store.get_store() is None